@@ -1,3 +1,6 @@
+import time
+# Точка отсчета трассы запуска: фиксируется до тяжелых импортов
+_STARTUP_T0 = time.perf_counter()
 import sys
 import os
 import requests
@@ -5,45 +8,2331 @@ import xml.etree.ElementTree as ET
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QTextEdit, QPushButton, 
                             QMessageBox, QProgressBar, QLabel, QSplashScreen,
-                            QFrame, QGridLayout, QLineEdit, QScrollArea)
-from PySide6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve, Property, QPoint, QSize
+                            QFrame, QGridLayout, QLineEdit, QScrollArea,
+                            QComboBox, QSpinBox, QTableWidget, QTableWidgetItem,
+                            QHeaderView, QInputDialog, QPlainTextEdit, QTableView, QTabWidget)
+from PySide6.QtCore import (Qt, QTimer, QPropertyAnimation, QEasingCurve, Property, QPoint, QSize,
+                            QObject, Signal, QAbstractTableModel, QModelIndex, QBuffer, QIODevice)
 from PySide6.QtGui import QPixmap, QKeySequence, QShortcut, QFont, QPalette, QColor, QFontDatabase, QIcon, QImage
 from pathlib import Path
 import concurrent.futures
-import time
+import multiprocessing
 import subprocess
+import argparse
+import threading
+import queue
+import asyncio
+import json
+import shutil
+import hashlib
+import csv
+import io
+import tarfile
+import zipfile
+import sqlite3
+import email.utils
+import contextlib
+from collections import OrderedDict, deque
+import numpy as np
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # Движок asyncio недоступен, остается загрузка потоками
+
+# Адрес YML-каталога OutmaxShop
+CATALOG_URL = 'https://outmaxshop.com/yml/all_new.yml'
+
+# Заголовки для запросов
+DEFAULT_HEADERS = {
+    'User-Agent': ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                   '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'),
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Connection': 'keep-alive',
+}
+
+class StartupTrace:
+    """Трасса запуска приложения: фазы с отметками времени от старта процесса до готовности.
+
+    Фазы пишутся как span (контекстный менеджер), последовательные phase
+    внутри одной категории или мгновенные отметки mark. Экспорт - в простой
+    JSON или в формат Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    FORMATS = ('chrome', 'json')
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.events = []
+        self._open_phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, start, end, category='startup'):
+        thread = threading.current_thread()
+        with self._lock:
+            self.events.append({'name': name, 'category': category, 'start': start - self.origin,
+                                'duration': end - start, 'thread': thread.name,
+                                'tid': thread.ident})
+
+    @contextlib.contextmanager
+    def span(self, name, category='startup'):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), category)
+
+    def phase(self, name, category='window'):
+        """Закрывает текущую фазу категории и открывает следующую; None - просто закрыть"""
+        now = time.perf_counter()
+        previous = self._open_phases.pop(category, None)
+        if previous is not None:
+            self.add(previous[0], previous[1], now, category)
+        if name is not None:
+            self._open_phases[category] = (name, now)
+
+    def mark(self, name, category='startup'):
+        now = time.perf_counter()
+        self.add(name, now, now, category)
+        return now - self.origin
+
+    def to_json(self):
+        return {
+            'events': [
+                {'name': event['name'], 'category': event['category'], 'thread': event['thread'],
+                 'start_ms': round(event['start'] * 1000, 3),
+                 'duration_ms': round(event['duration'] * 1000, 3)}
+                for event in sorted(self.events, key=lambda event: event['start'])
+            ],
+        }
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for event in self.events:
+            threads[event['tid']] = event['thread']
+            entry = {'name': event['name'], 'cat': event['category'], 'pid': pid,
+                     'tid': event['tid'], 'ts': round(event['start'] * 1e6, 1)}
+            if event['duration']:
+                entry.update(ph='X', dur=round(event['duration'] * 1e6, 1))
+            else:
+                entry.update(ph='i', s='g')
+            events.append(entry)
+        for tid, name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, fmt='chrome'):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат трассы: {fmt}")
+        data = self.to_chrome_trace() if fmt == 'chrome' else self.to_json()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def summary(self):
+        """Таблица фаз по времени начала для журнала и консоли"""
+        rows = [
+            (event['name'], event['category'], event['thread'],
+             f"{event['start'] * 1000:.0f}", f"{event['duration'] * 1000:.0f}")
+            for event in sorted(self.events, key=lambda event: event['start'])
+        ]
+        return format_table(['Фаза', 'Категория', 'Поток', 'Начало, мс', 'Длительность, мс'], rows)
+
+# Трасса текущего запуска; импорты модулей - первая фаза
+STARTUP_TRACE = StartupTrace(_STARTUP_T0)
+STARTUP_TRACE.add('imports', _STARTUP_T0, time.perf_counter())
+
+def fetch_catalog(headers=None, on_progress=None, chunk_size=256 * 1024):
+    """Скачивает YML-каталог и возвращает корневой XML-элемент.
+
+    Ответ читается потоком и разбирается по мере получения, так что разбор
+    идет одновременно с загрузкой. on_progress(получено байт, всего байт
+    или None без Content-Length, разобрано offer) вызывается после каждого блока;
+    байты считаются по сети, то есть для сжатого ответа - сжатые, как и Content-Length.
+    """
+    url = os.getenv('PARSER_CATALOG_URL', CATALOG_URL)
+    with requests.get(url, headers=headers or DEFAULT_HEADERS, stream=True) as response:
+        response.raise_for_status()
+        total = response.headers.get('Content-Length')
+        total = int(total) if total and total.isdigit() else None
+        parser = ET.XMLPullParser(events=('start', 'end'))
+        root = None
+        received = 0
+        offers = 0
+        for chunk in response.iter_content(chunk_size):
+            # iter_content отдает распакованные данные, а Content-Length - размер сжатых
+            received = response.raw.tell()
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if root is None and event == 'start':
+                    root = element
+                elif event == 'end' and element.tag == 'offer':
+                    offers += 1
+            if on_progress is not None:
+                on_progress(received, total, offers)
+        parser.close()
+        for event, element in parser.read_events():
+            if event == 'end' and element.tag == 'offer':
+                offers += 1
+    if root is None:
+        raise ValueError("пустой ответ вместо каталога")
+    if on_progress is not None:
+        on_progress(received, received, offers)
+    return root
+
+def format_table(headers, rows):
+    """Форматирует строки отчёта в текстовую таблицу для консоли"""
+    cells = [[str(value) for value in row] for row in rows]
+    widths = [len(header) for header in headers]
+    for row in cells:
+        for i, value in enumerate(row):
+            widths[i] = max(widths[i], len(value))
+    lines = ['  '.join(header.ljust(widths[i]) for i, header in enumerate(headers))]
+    lines.append('  '.join('-' * width for width in widths))
+    for row in cells:
+        lines.append('  '.join(value.ljust(widths[i]) for i, value in enumerate(row)))
+    return '\n'.join(lines)
+
+class CatalogAnalytics:
+    """Колоночное представление каталога на NumPy для агрегатов по всему фиду"""
+
+    # Поля для группировки: параметры offer и vendor
+    GROUP_FIELDS = ('Категория', 'Сезон', 'Страна бренда', 'Пол', 'Цвет',
+                    'Материал верха', 'Материал подошвы', 'Модель', 'vendor')
+    # Числовые поля: цена, старая цена и скидка в процентах
+    VALUE_FIELDS = {'price': 'Цена', 'oldprice': 'Старая цена', 'discount': 'Скидка, %'}
+    AGGREGATES = {
+        'count': 'Количество товаров',
+        'stats': 'Среднее / мин / макс',
+        'hist': 'Гистограмма',
+        'percentiles': 'Перцентили',
+    }
+    PERCENTILES = (5, 25, 50, 75, 95)
+    MISSING = 'Нет данных'
+
+    def __init__(self, ids, values, codes, labels):
+        self.ids = ids        # массив артикулов
+        self.values = values  # поле -> float64 массив (NaN - нет значения)
+        self.codes = codes    # поле -> int32 массив кодов групп
+        self.labels = labels  # поле -> подписи групп по коду
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _to_float(text):
+        try:
+            return float(text.replace(' ', '').replace(',', '.'))
+        except (AttributeError, ValueError):
+            return np.nan
+
+    @classmethod
+    def from_xml(cls, xml_data):
+        ids = []
+        prices = []
+        oldprices = []
+        codes = {field: [] for field in cls.GROUP_FIELDS}
+        lookups = {field: {} for field in cls.GROUP_FIELDS}
+
+        # Единственный проход по XML, дальше работаем только с массивами
+        for offer in xml_data.iter('offer'):
+            ids.append(offer.get('id'))
+            prices.append(cls._to_float(offer.findtext('price')))
+            oldprices.append(cls._to_float(offer.findtext('oldprice')))
+
+            row = {'vendor': offer.findtext('vendor')}
+            for param in offer.iter('param'):
+                name = param.get('name')
+                if name in lookups and name not in row:
+                    row[name] = param.text
+
+            for field in cls.GROUP_FIELDS:
+                label = (row.get(field) or '').strip() or cls.MISSING
+                lookup = lookups[field]
+                codes[field].append(lookup.setdefault(label, len(lookup)))
+
+        price = np.array(prices, dtype=np.float64)
+        oldprice = np.array(oldprices, dtype=np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            discount = np.where(oldprice > price, (oldprice - price) / oldprice * 100.0, 0.0)
+        discount[np.isnan(price)] = np.nan
+
+        return cls(
+            np.array(ids, dtype=object),
+            {'price': price, 'oldprice': oldprice, 'discount': discount},
+            {field: np.array(codes[field], dtype=np.int32) for field in cls.GROUP_FIELDS},
+            {field: list(lookups[field]) for field in cls.GROUP_FIELDS},
+        )
+
+    def _check_fields(self, by=None, value=None):
+        if by is not None and by not in self.codes:
+            raise ValueError(f"Неизвестное поле группировки: {by}")
+        if value is not None and value not in self.values:
+            raise ValueError(f"Неизвестное числовое поле: {value}")
+
+    def _grouped(self, by, value):
+        # Сортируем по (группа, значение): каждая группа - непрерывный отрезок
+        values = self.values[value]
+        valid = ~np.isnan(values)
+        if by is None:
+            codes = np.zeros(int(valid.sum()), dtype=np.int32)
+            labels = ['Весь каталог']
+        else:
+            codes = self.codes[by][valid]
+            labels = self.labels[by]
+        values = values[valid]
+        order = np.lexsort((values, codes))
+        codes = codes[order]
+        values = values[order]
+        if len(codes) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return labels, codes, values, empty, empty
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        ends = np.r_[starts[1:], len(codes)]
+        return labels, codes, values, starts, ends
+
+    def group_count(self, by):
+        self._check_fields(by=by)
+        counts = np.bincount(self.codes[by], minlength=len(self.labels[by]))
+        order = np.argsort(-counts, kind='stable')
+        return [(self.labels[by][i], int(counts[i])) for i in order if counts[i]]
+
+    def group_stats(self, by, value='price'):
+        self._check_fields(by=by, value=value)
+        labels, codes, values, starts, ends = self._grouped(by, value)
+        if len(starts) == 0:
+            return []
+        counts = ends - starts
+        means = np.add.reduceat(values, starts) / counts
+        mins = values[starts]
+        maxs = values[ends - 1]
+        order = np.argsort(-counts, kind='stable')
+        return [(labels[codes[starts[i]]], int(counts[i]), round(float(means[i]), 2),
+                 round(float(mins[i]), 2), round(float(maxs[i]), 2)) for i in order]
+
+    def percentiles(self, value='price', by=None, qs=PERCENTILES):
+        self._check_fields(by=by, value=value)
+        labels, codes, values, starts, ends = self._grouped(by, value)
+        if len(starts) == 0:
+            return []
+        counts = ends - starts
+        # Линейная интерполяция внутри отсортированных групп, как в np.percentile
+        positions = (counts - 1)[:, None] * (np.asarray(qs, dtype=np.float64) / 100.0)[None, :]
+        lower = np.floor(positions).astype(np.intp)
+        upper = np.ceil(positions).astype(np.intp)
+        low_values = values[starts[:, None] + lower]
+        high_values = values[starts[:, None] + upper]
+        result = low_values + (high_values - low_values) * (positions - lower)
+        order = np.argsort(-counts, kind='stable')
+        return [(labels[codes[starts[i]]], int(counts[i]), *(round(float(v), 2) for v in result[i]))
+                for i in order]
+
+    def histogram(self, value='price', bins=10, by=None, group=None):
+        self._check_fields(by=by, value=value)
+        values = self.values[value]
+        mask = ~np.isnan(values)
+        if by is not None and group is not None:
+            if group not in self.labels[by]:
+                raise ValueError(f"Группа не найдена: {group}")
+            mask &= self.codes[by] == self.labels[by].index(group)
+        counts, edges = np.histogram(values[mask], bins=bins)
+        return [(f"{edges[i]:.0f} – {edges[i + 1]:.0f}", int(counts[i]))
+                for i in range(len(counts))]
+
+    def report(self, aggregate, by=None, value='price', bins=10, group=None):
+        """Возвращает заголовки и строки отчёта - общий формат для GUI и консоли"""
+        value_title = self.VALUE_FIELDS.get(value, value)
+        by_title = by or 'Группа'
+        if aggregate == 'count':
+            if by is None:
+                raise ValueError("Для подсчёта укажите поле группировки")
+            return [by_title, 'Товаров'], self.group_count(by)
+        if aggregate == 'stats':
+            if by is None:
+                raise ValueError("Для статистики укажите поле группировки")
+            return ([by_title, 'Товаров', f"{value_title}: среднее", 'Мин', 'Макс'],
+                    self.group_stats(by, value))
+        if aggregate == 'percentiles':
+            return ([by_title, 'Товаров', *(f"P{q}" for q in self.PERCENTILES)],
+                    self.percentiles(value, by))
+        if aggregate == 'hist':
+            return [value_title, 'Товаров'], self.histogram(value, bins, by, group)
+        raise ValueError(f"Неизвестный агрегат: {aggregate}")
+
+class CatalogIndex:
+    """Индексы каталога: артикулы, дерево категорий и группы моделей"""
+
+    def __init__(self, xml_data):
+        self.offers = {}          # артикул -> элемент offer
+        self.model_groups = {}    # (бренд, модель) -> артикулы всех расцветок
+        self.offer_groups = {}    # артикул -> ключ группы модели
+        self.category_names = {}  # id категории -> название
+        self.category_parents = {}
+        self.category_children = {}
+        # Артикулы, упорядоченные по обходу дерева в глубину: товары любого
+        # поддерева лежат непрерывным отрезком [start, end)
+        self.category_offers = []
+        self.subtree_ranges = {}
+        self.category_depths = {}
+
+        for category in xml_data.iter('category'):
+            category_id = category.get('id')
+            if category_id is None:
+                continue
+            self.category_names[category_id] = (category.text or '').strip() or category_id
+            self.category_parents[category_id] = category.get('parentId')
+
+        offers_by_category = {}
+        for offer in xml_data.iter('offer'):
+            article = offer.get('id')
+            if article is None:
+                continue
+            self.offers[article] = offer
+            category_id = offer.findtext('categoryId')
+            if category_id is not None:
+                offers_by_category.setdefault(category_id.strip(), []).append(article)
+            self._index_model(article, offer)
+
+        self._build_tree(offers_by_category)
+
+    def _build_tree(self, offers_by_category):
+        roots = []
+        for category_id, parent_id in self.category_parents.items():
+            if parent_id in self.category_names and parent_id != category_id:
+                self.category_children.setdefault(parent_id, []).append(category_id)
+            else:
+                roots.append(category_id)
+
+        # Итеративный обход в глубину (без рекурсии для глубоких деревьев)
+        visited = set()
+        stack = [(category_id, 0, False) for category_id in reversed(roots)]
+        while stack:
+            category_id, depth, finished = stack.pop()
+            if finished:
+                start = self.subtree_ranges[category_id][0]
+                self.subtree_ranges[category_id] = (start, len(self.category_offers))
+                continue
+            if category_id in visited:
+                continue
+            visited.add(category_id)
+            self.category_depths[category_id] = depth
+            self.subtree_ranges[category_id] = (len(self.category_offers), None)
+            self.category_offers.extend(offers_by_category.get(category_id, []))
+            stack.append((category_id, depth, True))
+            for child_id in reversed(self.category_children.get(category_id, [])):
+                stack.append((child_id, depth + 1, False))
+
+    def _index_model(self, article, offer):
+        vendor = (offer.findtext('vendor') or '').strip()
+        model = None
+        for param in offer.iter('param'):
+            if param.get('name') == 'Модель':
+                model = (param.text or '').strip()
+                break
+        if model:
+            # Одинаковые названия моделей у разных брендов не смешиваем
+            key = (vendor, model)
+            self.model_groups.setdefault(key, []).append(article)
+            self.offer_groups[article] = key
+
+    def get_offer(self, article):
+        return self.offers.get(article)
+
+    def model_group(self, article):
+        """Возвращает артикулы всех товаров той же модели (включая сам товар)"""
+        key = self.offer_groups.get(article)
+        if key is None:
+            return [article] if article in self.offers else []
+        return self.model_groups[key]
+
+    def expand_model_groups(self, articles):
+        """Дополняет список артикулов всеми расцветками их моделей, сохраняя порядок"""
+        expanded = {}
+        for article in articles:
+            for sibling in self.model_group(article) or [article]:
+                expanded.setdefault(sibling, None)
+        return list(expanded)
+
+    def select_category(self, category_id):
+        """Возвращает артикулы категории и всех её потомков"""
+        start, end = self.subtree_ranges.get(category_id, (0, 0))
+        return self.category_offers[start:end]
+
+    def category_path(self, category_id):
+        names = []
+        seen = set()
+        while category_id in self.category_names and category_id not in seen:
+            seen.add(category_id)
+            names.append(self.category_names[category_id])
+            category_id = self.category_parents.get(category_id)
+        return ' / '.join(reversed(names))
+
+    def category_choices(self):
+        """Список (id, подпись) в порядке дерева для выбора ветки"""
+        choices = []
+        for category_id in sorted(self.subtree_ranges, key=lambda c: self.subtree_ranges[c][0]):
+            start, end = self.subtree_ranges[category_id]
+            indent = '    ' * self.category_depths[category_id]
+            label = f"{indent}{self.category_names[category_id]} ({end - start})"
+            choices.append((category_id, label))
+        return choices
+
+def extract_product(article, offer):
+    """Собирает представление товара за один проход по дочерним элементам offer"""
+    fields = {}
+    params = {}
+    sizes = []
+    images = []
+    for child in offer.iter():
+        tag = child.tag
+        if tag == 'param':
+            name = child.get('name')
+            if name == 'Размер':
+                sizes.append(child.text)
+            elif name is not None:
+                # Как и раньше, при повторах побеждает последнее значение
+                params[name] = child.text
+        elif tag == 'picture':
+            if child.text:
+                images.append(child.text)
+        elif tag in ('name', 'price', 'oldprice', 'vendor', 'categoryId') and tag not in fields:
+            fields[tag] = child.text
+
+    return {
+        'article': article,
+        'name': fields.get('name'),
+        'price': fields.get('price'),
+        'oldprice': fields.get('oldprice'),
+        'vendor': fields.get('vendor'),
+        'category_id': fields.get('categoryId'),
+        'params': params,
+        'sizes': tuple(sizes),
+        'images': tuple(images),
+    }
+
+class ProductCache:
+    """Ограниченный LRU-кэш представлений товаров, общий для поиска и массовой загрузки"""
+
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.catalog_index = None
+        self._views = OrderedDict()
+        self._missing = set()  # артикулы, которых точно нет в текущем каталоге
+        self._lock = threading.Lock()
+
+    def reset(self, catalog_index):
+        # Новый каталог - старые представления и промахи больше не действительны
+        with self._lock:
+            self.catalog_index = catalog_index
+            self._views.clear()
+            self._missing.clear()
+
+    def get(self, article):
+        with self._lock:
+            if article in self._missing:
+                return None
+            view = self._views.get(article)
+            if view is not None:
+                self._views.move_to_end(article)
+                return view
+            catalog_index = self.catalog_index
+
+        offer = catalog_index.get_offer(article) if catalog_index is not None else None
+        if offer is None:
+            if catalog_index is not None:
+                with self._lock:
+                    if catalog_index is self.catalog_index:
+                        self._missing.add(article)
+            return None
+
+        view = extract_product(article, offer)
+        with self._lock:
+            # Каталог могли обновить, пока мы разбирали offer
+            if catalog_index is self.catalog_index:
+                self._views[article] = view
+                if len(self._views) > self.max_size:
+                    self._views.popitem(last=False)
+        return view
+
+    def validate(self, articles):
+        """Проверяет список по индексу до начала загрузки.
+
+        Возвращает уникальные найденные артикулы в исходном порядке,
+        отсутствующие в каталоге и повторяющиеся.
+        """
+        found = []
+        missing = []
+        duplicates = []
+        seen = set()
+        with self._lock:
+            catalog_index = self.catalog_index
+            for article in articles:
+                if article in seen:
+                    duplicates.append(article)
+                    continue
+                seen.add(article)
+                if (article in self._missing or catalog_index is None
+                        or catalog_index.get_offer(article) is None):
+                    self._missing.add(article)
+                    missing.append(article)
+                else:
+                    found.append(article)
+        return found, missing, duplicates
+
+def safe_filename(name):
+    """Заменяет символы, недопустимые в именах файлов Windows"""
+    for char in '/\\:*?"<>|':
+        name = name.replace(char, '_')
+    return name
+
+def image_filename(article, name, index):
+    """Имя файла фотографии: артикул, полное название товара и номер"""
+    return f"{article}_{safe_filename(name)}_{index}.jpg"
+
+def product_name(product):
+    return product['name'] if product['name'] is not None else "Нет названия"
+
+class ArticleJob:
+    """Состояние одного артикула при прохождении через этапы конвейера"""
+
+    def __init__(self, article, product):
+        self.article = article
+        self.product = product
+        self.name = product_name(product)
+        self.product_dir = None
+        self.images = []     # (url, путь) для каждой фотографии
+        self.results = []    # успешность загрузки каждой фотографии
+        self.digests = []    # (размер, sha256) записанных фотографий
+        self.data = None     # содержимое фотографий, если приемникам нужны байты из памяти
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+
+# Маркер завершения для очередей конвейера
+_STOP = object()
+
+class Downloader:
+    """Общий интерфейс загрузчиков: submit(url, callback) -> callback(data, error, meta).
+
+    meta содержит статус ответа и валидаторы (etag, last_modified); при
+    ответе 304 на условный запрос data и error равны None. submit
+    блокируется, когда в работе слишком много запросов, close дожидается
+    завершения всех запросов и их callback.
+    """
+
+    name = None
+
+    def __init__(self, headers, concurrency, timeout=30):
+        self.headers = headers
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.concurrency * 2)
+        self._stats_lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_latency = 0.0
+
+    def _record(self, latency, data, error):
+        with self._stats_lock:
+            self.total_latency += latency
+            if error is not None:
+                self.errors += 1
+            else:
+                self.count += 1
+                self.bytes += len(data or b'')
+
+    @staticmethod
+    def conditional_headers(etag=None, last_modified=None):
+        """Заголовки условного запроса по сохраненным валидаторам"""
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def stats(self):
+        return {
+            'engine': self.name,
+            'fetch_count': self.count,
+            'fetch_errors': self.errors,
+            'fetch_bytes': self.bytes,
+            'fetch_latency': self.total_latency,
+        }
+
+class ThreadDownloader(Downloader):
+    """Загрузчик на пуле потоков с общей сессией requests"""
+
+    name = 'threads'
+
+    def __init__(self, headers, concurrency=8, timeout=30):
+        super().__init__(headers, concurrency, timeout)
+        self._session = None
+        self._executor = None
+
+    def start(self):
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix='download')
+
+    def submit(self, url, callback, headers=None):
+        self._slots.acquire()
+        self._executor.submit(self._fetch, url, callback, headers)
+
+    def _fetch(self, url, callback, headers):
+        try:
+            start_time = time.perf_counter()
+            meta = {}
+            try:
+                response = self._session.get(url, headers={**self.headers, **(headers or {})},
+                                             timeout=self.timeout)
+                response.raise_for_status()
+                meta = {
+                    'status': response.status_code,
+                    'etag': response.headers.get('ETag'),
+                    'last_modified': response.headers.get('Last-Modified'),
+                }
+                data = None if response.status_code == 304 else response.content
+                error = None
+            except Exception as e:
+                data, error = None, e
+            self._record(time.perf_counter() - start_time, data, error)
+            callback(data, error, meta)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self._session.close()
+
+class AsyncioDownloader(Downloader):
+    """Загрузчик на одном цикле asyncio с общим пулом соединений aiohttp"""
+
+    name = 'asyncio'
+
+    def __init__(self, headers, concurrency=64, timeout=30):
+        super().__init__(headers, concurrency, timeout)
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+        self._futures = set()
+        self._futures_lock = threading.Lock()
+
+    def start(self):
+        if aiohttp is None:
+            raise RuntimeError("Для движка asyncio установите пакет aiohttp")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='download-loop',
+                                        daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+
+    async def _open(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+
+    def submit(self, url, callback, headers=None):
+        self._slots.acquire()
+        future = asyncio.run_coroutine_threadsafe(self._fetch(url, callback, headers), self._loop)
+        with self._futures_lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    async def _fetch(self, url, callback, headers):
+        try:
+            async with self._semaphore:
+                start_time = time.perf_counter()
+                meta = {}
+                try:
+                    async with self._session.get(url, headers=headers) as response:
+                        response.raise_for_status()
+                        meta = {
+                            'status': response.status,
+                            'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified'),
+                        }
+                        data = None if response.status == 304 else await response.read()
+                        error = None
+                except Exception as e:
+                    data, error = None, e
+                self._record(time.perf_counter() - start_time, data, error)
+            # callback может блокироваться (например, на буфере записи) - не держим цикл
+            await self._loop.run_in_executor(None, callback, data, error, meta)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._futures_lock:
+            futures = list(self._futures)
+        concurrent.futures.wait(futures)
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+# Доступные движки загрузки: имя -> (класс, параллельность по умолчанию)
+DOWNLOAD_ENGINES = {
+    'threads': (ThreadDownloader, 8),
+    'asyncio': (AsyncioDownloader, 64),
+}
+
+def create_downloader(engine=None, headers=None, concurrency=None):
+    """Создает загрузчик по имени движка (по умолчанию из PARSER_DOWNLOAD_ENGINE)"""
+    engine = engine or os.getenv('PARSER_DOWNLOAD_ENGINE', 'threads')
+    if engine not in DOWNLOAD_ENGINES:
+        raise ValueError(f"Неизвестный движок загрузки: {engine}")
+    downloader_class, default_concurrency = DOWNLOAD_ENGINES[engine]
+    concurrency = concurrency or int(os.getenv('PARSER_DOWNLOAD_CONCURRENCY', default_concurrency))
+    return downloader_class(headers or DEFAULT_HEADERS, concurrency)
+
+class DiskWriter:
+    """Отдельный этап записи на диск со своим пулом потоков.
+
+    Сетевые потоки только передают готовые данные и сразу возвращаются
+    к загрузке. Буфер ограничен по объёму в байтах: если диск не успевает,
+    submit блокируется и притормаживает загрузку.
+    """
+
+    def __init__(self, workers=2, max_buffered_bytes=64 * 1024 * 1024):
+        self.workers = max(1, workers)
+        self.max_buffered_bytes = max_buffered_bytes
+        self._pending = deque()
+        self._buffered_bytes = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._threads = []
+        # Статистика записи
+        self.files = 0
+        self.bytes = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"disk-writer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, path, data, callback=None):
+        """Ставит данные в очередь записи; callback(ok) вызывается из потока записи"""
+        size = len(data)
+        with self._condition:
+            # Один слишком большой файл пропускаем, иначе он ждал бы вечно
+            while self._buffered_bytes and self._buffered_bytes + size > self.max_buffered_bytes:
+                self._condition.wait()
+            self._pending.append((path, data, callback))
+            self._buffered_bytes += size
+            self._condition.notify_all()
+
+    def close(self):
+        """Дожидается записи всех данных из буфера и останавливает потоки"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+                path, data, callback = self._pending.popleft()
+
+            # Любая ошибка записи - это неудача одного файла, а не остановка потока:
+            # иначе его байты никогда не освободятся и submit/close зависнут
+            start_time = time.perf_counter()
+            try:
+                self._write(path, data)
+                ok = True
+            except Exception:
+                ok = False
+            latency = time.perf_counter() - start_time
+
+            with self._condition:
+                self._buffered_bytes -= len(data)
+                if ok:
+                    self.files += 1
+                    self.bytes += len(data)
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                self._condition.notify_all()
+
+            if callback is not None:
+                try:
+                    callback(ok)
+                except Exception:
+                    # Ошибка обработчика не должна останавливать поток записи
+                    pass
+
+    def _write(self, path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def verify(self, path):
+        """Проверяет, что файл действительно записан и не пустой"""
+        return path.is_file() and path.stat().st_size > 0
+
+class ArchiveWriter(DiskWriter):
+    """Этап записи прямо в потоковый архив ZIP или TAR вместо дерева папок.
+
+    Файлы попадают в архив по мере загрузки, без временных копий на диске.
+    При заданном split_bytes архив делится на части, а в конец последней
+    части дописывается manifest.json со списком всех файлов.
+    """
+
+    FORMATS = {'zip': 'ZIP', 'tar': 'TAR'}
+    MANIFEST_NAME = "manifest.json"
+
+    def __init__(self, base_path, fmt, root, split_bytes=0, max_buffered_bytes=64 * 1024 * 1024):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат архива: {fmt}")
+        # Архив пишется последовательно, поэтому поток записи один
+        super().__init__(1, max_buffered_bytes)
+        self.base_path = Path(base_path)
+        self.format = fmt
+        self.root = Path(root)
+        self.split_bytes = split_bytes
+        self.parts = []
+        self.entries = []
+        self._members = {}      # путь в products -> (имя в архиве, файл части)
+        self._file = None
+        self._archive = None
+        self._part_entries = 0
+        self._part_overhead = 0
+        self._part_bytes = 0
+
+    @classmethod
+    def for_batch(cls, fmt, root, split_bytes=0, exports_dir=Path("exports")):
+        base_path = exports_dir / f"batch_{time.strftime('%Y-%m-%d_%H-%M-%S')}"
+        return cls(base_path, fmt, root, split_bytes)
+
+    def _part_path(self, number):
+        suffix = f".part{number:03d}" if self.split_bytes else ""
+        return self.base_path.with_name(f"{self.base_path.name}{suffix}.{self.format}")
+
+    def _open_part(self):
+        path = self._part_path(len(self.parts) + 1)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, 'wb')
+        if self.format == 'zip':
+            self._archive = zipfile.ZipFile(self._file, 'w')
+        else:
+            self._archive = tarfile.open(fileobj=self._file, mode='w|')
+        self.parts.append(path)
+        self._part_entries = 0
+        self._part_overhead = 22
+        self._part_bytes = 0
+
+    def _tar_info(self, name, data):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = time.time()
+        return info
+
+    def _tar_entry_size(self, info):
+        # Заголовок (с PAX-записью для длинных и не-ASCII имен) и данные до целого блока
+        header = info.tobuf(self._archive.format, self._archive.encoding, self._archive.errors)
+        blocks = -(-info.size // tarfile.BLOCKSIZE)
+        return len(header) + blocks * tarfile.BLOCKSIZE
+
+    def _part_size_with(self, name, data, info):
+        """Размер текущей части, если дописать в нее файл и закрыть ее"""
+        if self.format == 'zip':
+            # Заголовок записи и ее запись в центральном каталоге в конце части
+            name_size = len(name.encode('utf-8'))
+            return self._file.tell() + self._part_overhead + len(data) + 30 + 46 + 2 * name_size
+        # tell() потокового TAR отстает на размер буфера, поэтому байты части считаем сами;
+        # в конце части - два нулевых блока
+        return self._part_bytes + self._tar_entry_size(info) + 2 * tarfile.BLOCKSIZE
+
+    def _close_part(self):
+        self._archive.close()
+        if self.format == 'tar':
+            # Дополнение до записи в 10 КБ нужно только ленточным накопителям и съедало бы
+            # лимит части: оставляем файлы и два нулевых блока конца архива
+            self._file.truncate(self._part_bytes + 2 * tarfile.BLOCKSIZE)
+        self._file.close()
+        self._archive = None
+        self._file = None
+
+    def _add(self, name, data, split=True):
+        info = self._tar_info(name, data) if self.format == 'tar' else None
+        if self._archive is None:
+            self._open_part()
+        elif split and self.split_bytes and self._part_entries and \
+                self._part_size_with(name, data, info) > self.split_bytes:
+            self._close_part()
+            self._open_part()
+        if self.format == 'zip':
+            # Фотографии уже сжаты, повторно сжимаем только текст
+            compression = zipfile.ZIP_STORED
+            if name.endswith(('.txt', '.json')):
+                compression = zipfile.ZIP_DEFLATED
+            self._archive.writestr(name, data, compress_type=compression)
+        else:
+            self._part_bytes += self._tar_entry_size(info)
+            self._archive.addfile(info, io.BytesIO(data))
+        self._part_entries += 1
+        if self.format == 'zip':
+            self._part_overhead += 46 + len(name.encode('utf-8'))
+
+    def _write(self, path, data):
+        name = Path(path).relative_to(self.root).as_posix()
+        self._add(name, data)
+        self.entries.append({
+            'name': name,
+            'size': len(data),
+            'sha256': hashlib.sha256(data).hexdigest(),
+            'part': self.parts[-1].name,
+        })
+        self._members[Path(path)] = (name, self.parts[-1].name)
+
+    def verify(self, path):
+        return Path(path) in self._members
+
+    def member(self, path):
+        """(имя в архиве, файл части) для записанного файла или None"""
+        return self._members.get(Path(path))
+
+    def close(self):
+        super().close()
+        if self._archive is None:
+            self._open_part()
+        # Манифест всегда дописывается в последнюю часть, даже если она чуть превысит лимит
+        manifest = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'format': self.format,
+            'parts': [path.name for path in self.parts],
+            'files': self.entries,
+        }
+        manifest_data = json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8')
+        self._add(self.MANIFEST_NAME, manifest_data, split=False)
+        self._close_part()
+
+class BatchPipeline:
+    """Поэтапный конвейер массовой загрузки: поиск -> описание -> фотографии -> проверка.
+
+    Этапы связаны ограниченными очередями и имеют собственное число потоков,
+    поэтому сеть, диск и процессор работают одновременно, а память
+    ограничена глубиной очередей.
+    """
+
+    STAGES = ('lookup', 'metadata', 'images', 'verify')
+    # Этап images только раздает фотографии загрузчику, параллельность задает сам загрузчик
+    DEFAULT_WORKERS = {'lookup': 1, 'metadata': 2, 'images': 1, 'verify': 1, 'writer': 2}
+
+    def __init__(self, product_cache, layout, downloader, workers=None, queue_size=64,
+                 write_buffer_bytes=64 * 1024 * 1024, journal=None, sinks=(),
+                 write_info_files=True, archive=None):
+        self.product_cache = product_cache
+        self.layout = layout
+        self.downloader = downloader
+        self.journal = journal
+        # Приемники готовых записей о товарах (выгрузка в файл, база и т.п.)
+        self.sinks = list(sinks)
+        self.write_info_files = write_info_files
+        self.workers = dict(self.DEFAULT_WORKERS, **(workers or {}))
+        self.queues = {stage: queue.Queue(maxsize=queue_size) for stage in self.STAGES}
+        # При выгрузке в архив файлы пишутся в него вместо папки products
+        self.archive = archive
+        if archive is not None:
+            self.writer = archive
+        else:
+            self.writer = DiskWriter(self.workers['writer'], write_buffer_bytes)
+        # В архивном режиме файлов в products нет: фотографии для базы берутся из памяти
+        self.keep_image_data = archive is not None and any(
+            getattr(sink, 'wants_image_data', False) for sink in self.sinks)
+        self.cancelled = threading.Event()
+        self.on_result = None
+        self.on_finished = None
+        self.on_outcome = None
+        self.on_progress = None
+        self.total = 0
+        self.done = 0
+        self._done_lock = threading.Lock()
+        self._coordinator = None
+
+    def start(self, articles, on_result, on_finished=None, on_outcome=None, on_progress=None):
+        """Запускает конвейер в фоновых потоках и сразу возвращает управление.
+
+        on_result получает строку для журнала, on_outcome - итог по артикулу
+        в виде словаря (статус, фотографии, размеры, байты, длительность),
+        on_progress(готово, всего) - вызывается по завершении каждого артикула.
+        """
+        self.downloader.start()
+        self.on_result = on_result
+        self.on_finished = on_finished
+        self.on_outcome = on_outcome
+        self.on_progress = on_progress
+        self.total = len(articles)
+        handlers = {
+            'lookup': self._lookup,
+            'metadata': self._metadata,
+            'images': self._fetch_image,
+            'verify': self._verify,
+        }
+        stage_threads = {}
+        writer_started = False
+        feeder = None
+        try:
+            for stage in self.STAGES:
+                stage_threads[stage] = []
+                for i in range(max(1, self.workers[stage])):
+                    thread = threading.Thread(target=self._run_stage,
+                                              args=(stage, handlers[stage]),
+                                              name=f"pipeline-{stage}-{i}", daemon=True)
+                    thread.start()
+                    stage_threads[stage].append(thread)
+            self.writer.start()
+            writer_started = True
+
+            feeder = threading.Thread(target=self._feed, args=(articles,), name="pipeline-feed",
+                                      daemon=True)
+            feeder.start()
+            self._coordinator = threading.Thread(target=self._coordinate,
+                                                 args=(feeder, stage_threads),
+                                                 name="pipeline-coordinator", daemon=True)
+            self._coordinator.start()
+        except Exception:
+            # Запуск не удался на полпути: останавливаем все, что уже работает
+            self.cancel()
+            self._coordinator = None
+            # Поток мог быть создан, но так и не запуститься
+            if feeder is not None and feeder.is_alive():
+                feeder.join()
+            self._stop_stages(stage_threads)
+            self.downloader.close()
+            # Архив при неудачном запуске закрывает его владелец вместе с приемниками
+            if writer_started and self.archive is None:
+                self.writer.close()
+            raise
+
+    def join(self, timeout=None):
+        if self._coordinator is not None:
+            self._coordinator.join(timeout)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _coordinate(self, feeder, stage_threads):
+        # Этап закрывается только после того, как завершились все его источники
+        feeder.join()
+        for stage in self.STAGES:
+            if stage == 'verify':
+                # Проверку закрываем только после загрузки и записи всех фотографий
+                self.downloader.close()
+                self.writer.close()
+            self._stop_stages({stage: stage_threads[stage]})
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.on_result(f"❌ Ошибка выгрузки: {str(e)}")
+        if self.on_finished is not None:
+            self.on_finished(self.stats())
+
+    def stats(self):
+        return {
+            **self.downloader.stats(),
+            'write_count': self.writer.files,
+            'write_bytes': self.writer.bytes,
+            'write_latency': self.writer.total_latency,
+            'write_max_latency': self.writer.max_latency,
+        }
+
+    def _stop_stages(self, stage_threads):
+        for stage, threads in stage_threads.items():
+            for _ in threads:
+                self.queues[stage].put(_STOP)
+            for thread in threads:
+                thread.join()
+
+    def _feed(self, articles):
+        for article in articles:
+            if self.cancelled.is_set():
+                break
+            # put блокируется при заполненной очереди - это и есть обратное давление
+            self.queues['lookup'].put(article)
+
+    def _run_stage(self, stage, handler):
+        stage_queue = self.queues[stage]
+        while True:
+            item = stage_queue.get()
+            if item is _STOP:
+                break
+            if not self.cancelled.is_set():
+                handler(item)
+
+    def _article_done(self):
+        # Прогресс считается по артикулам, а не по сообщениям журнала
+        with self._done_lock:
+            self.done += 1
+            done = self.done
+        if self.on_progress is not None:
+            self.on_progress(done, self.total)
+
+    def _outcome(self, article, status, job=None, images_ok=0, image_bytes=0):
+        if self.on_outcome is None:
+            return
+        self.on_outcome({
+            'article': article,
+            'status': status,
+            'images_ok': images_ok,
+            'images_total': len(job.images) if job is not None else 0,
+            'sizes': len(job.product['sizes']) if job is not None else 0,
+            'bytes': image_bytes,
+            'duration': time.perf_counter() - job.started if job is not None else 0.0,
+        })
+
+    def _lookup(self, article):
+        product = self.product_cache.get(article)
+        if product is None:
+            self.on_result(f"❌ Артикул {article}: товар не найден")
+            self._outcome(article, 'missing')
+            self._article_done()
+            return
+        self.queues['metadata'].put(ArticleJob(article, product))
+
+    def _metadata(self, job):
+        try:
+            # Создаем директорию для товара
+            job.product_dir = self.layout.product_dir(job.article)
+            if self.archive is None:
+                job.product_dir.mkdir(parents=True, exist_ok=True)
+                if self.journal is not None:
+                    self.journal.add(job.article)
+
+            # Сохраняем информацию в файл
+            if self.write_info_files:
+                info = (f"Артикул: {job.article}\n"
+                        f"Название: {job.name}\n\n"
+                        "Размеры:\n" + ''.join(f'"{size}"\n' for size in job.product['sizes']))
+                info_path = job.product_dir / f"{job.article}_info.txt"
+                if self.archive is None:
+                    with open(info_path, "w", encoding="utf-8") as f:
+                        f.write(info)
+                else:
+                    self.archive.submit(info_path, info.encode('utf-8'))
+
+            for i, image_url in enumerate(job.product['images'], 1):
+                image_path = job.product_dir / image_filename(job.article, job.name, i)
+                job.images.append((image_url, image_path))
+        except Exception as e:
+            self.on_result(f"❌ Артикул {job.article}: ошибка обработки - {str(e)}")
+            self._outcome(job.article, 'error', job)
+            self._article_done()
+            return
+
+        job.results = [False] * len(job.images)
+        job.digests = [None] * len(job.images)
+        if self.keep_image_data:
+            job.data = [None] * len(job.images)
+        job.pending = len(job.images)
+        if not job.images:
+            self.queues['verify'].put(job)
+            return
+        for index in range(len(job.images)):
+            self.queues['images'].put((job, index))
+
+    def _fetch_image(self, task):
+        job, index = task
+        url, path = job.images[index]
+
+        def on_fetched(data, error, meta):
+            if data is None:
+                self._image_done(job, index, False)
+                return
+
+            def on_written(ok):
+                # Хэш считается в потоке записи, сетевые потоки не задерживаются
+                if ok:
+                    job.digests[index] = (len(data), hashlib.sha256(data).hexdigest())
+                    if job.data is not None:
+                        job.data[index] = data
+                self._image_done(job, index, ok)
+
+            # Запись уходит в отдельный этап, загрузчик сразу берет следующую фотографию
+            self.writer.submit(path, data, on_written)
+
+        self.downloader.submit(url, on_fetched)
+
+    def _image_done(self, job, index, ok):
+        job.results[index] = ok
+        with job.lock:
+            job.pending -= 1
+            last = job.pending == 0
+        # Последняя фотография артикула передает его на проверку
+        if last:
+            self.queues['verify'].put(job)
+
+    def _verify(self, job):
+        try:
+            verified = [ok and self.writer.verify(path)
+                        for (url, path), ok in zip(job.images, job.results)]
+            successful_downloads = sum(verified)
+            if self.sinks:
+                record = product_record(job.product, job.images, verified, self.layout.products_dir,
+                                        job.digests, self.archive)
+                for sink in self.sinks:
+                    sink.write(record, job.data)
+                job.data = None
+            self.on_result(
+                f"✅ Артикул {job.article}: загружено {successful_downloads} "
+                f"из {len(job.images)} изображений, найдено {len(job.product['sizes'])} размеров"
+            )
+            if successful_downloads == len(job.images):
+                status = 'ok'
+            else:
+                status = 'partial' if successful_downloads else 'failed'
+            image_bytes = sum(digest[0] for digest in job.digests if digest is not None)
+            self._outcome(job.article, status, job, successful_downloads, image_bytes)
+        except Exception as e:
+            self.on_result(f"❌ Артикул {job.article}: ошибка обработки - {str(e)}")
+            self._outcome(job.article, 'error', job)
+        self._article_done()
+
+def product_record(product, images, verified, products_dir, digests=None, archive=None):
+    """Полная запись о товаре для выгрузки: параметры, цены, размеры и локальные фотографии.
+
+    С archive путь фотографии - имя файла внутри архива, а поле archive -
+    файл части архива, в которую она записана.
+    """
+    digests = digests or [None] * len(images)
+
+    def image_entry(url, path, ok, digest):
+        entry = {'url': url, 'path': None, 'archive': None, 'size': None, 'sha256': None}
+        if not ok:
+            return entry
+        if archive is not None:
+            entry['path'], entry['archive'] = archive.member(path) or (None, None)
+        else:
+            entry['path'] = path.relative_to(products_dir).as_posix()
+        if digest:
+            entry['size'], entry['sha256'] = digest
+        return entry
+
+    return {
+        'article': product['article'],
+        'name': product['name'],
+        'price': product['price'],
+        'oldprice': product['oldprice'],
+        'vendor': product['vendor'],
+        'category_id': product['category_id'],
+        'params': product['params'],
+        'sizes': list(product['sizes']),
+        'images': [image_entry(url, path, ok, digest)
+                   for (url, path), ok, digest in zip(images, verified, digests)],
+    }
+
+class ProductStore:
+    """Локальная база SQLite с товарами и их фотографиями.
+
+    Колонки артикула, модели, категории и цены проиндексированы; фотографии
+    хранятся путями к файлам или, по желанию, прямо в базе. База работает в
+    режиме WAL, а записи накапливаются и фиксируются пачками в одной транзакции.
+    """
+
+    STORE_FILE = ".products.db"
+    IMAGE_MODES = ('paths', 'blobs')
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS products ("
+        " article TEXT PRIMARY KEY, name TEXT, vendor TEXT, model TEXT, category_id TEXT,"
+        " price REAL, oldprice REAL, sizes TEXT, params TEXT, updated_at REAL)",
+        "CREATE TABLE IF NOT EXISTS images ("
+        " article TEXT NOT NULL, position INTEGER NOT NULL, url TEXT, path TEXT, data BLOB,"
+        " archive TEXT, PRIMARY KEY (article, position))",
+        "CREATE INDEX IF NOT EXISTS products_model ON products (vendor, model)",
+        "CREATE INDEX IF NOT EXISTS products_category ON products (category_id)",
+        "CREATE INDEX IF NOT EXISTS products_price ON products (price)",
+    )
+
+    def __init__(self, path, images='paths', products_dir=None, batch_size=200):
+        if images not in self.IMAGE_MODES:
+            raise ValueError(f"Неизвестный режим хранения фотографий: {images}")
+        self.path = Path(path)
+        self.images = images
+        self.products_dir = Path(products_dir) if products_dir is not None else None
+        self.batch_size = batch_size
+        self.count = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            for statement in self.SCHEMA:
+                self._db.execute(statement)
+            # Базы прежних версий: колонка части архива появилась позже
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(images)")]
+            if 'archive' not in columns:
+                self._db.execute("ALTER TABLE images ADD COLUMN archive TEXT")
+
+    @property
+    def wants_image_data(self):
+        return self.images == 'blobs'
+
+    @classmethod
+    def open(cls, layout, images='paths'):
+        return cls(layout.products_dir / cls.STORE_FILE, images, layout.products_dir)
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def relocate(cls, layout):
+        """Переписывает пути к фотографиям в базе после смены схемы папок"""
+        path = layout.products_dir / cls.STORE_FILE
+        if not path.exists():
+            return
+        db = sqlite3.connect(str(path))
+        try:
+            updates = []
+            for rowid, article, relative_path in db.execute(
+                    "SELECT rowid, article, path FROM images"
+                    " WHERE path IS NOT NULL AND archive IS NULL"):
+                parts = relative_path.split('/')
+                if article in parts:
+                    tail = '/'.join(parts[parts.index(article) + 1:])
+                    updates.append((f"{layout.relative_dir(article)}/{tail}", rowid))
+            with db:
+                db.executemany("UPDATE images SET path = ? WHERE rowid = ?", updates)
+        finally:
+            db.close()
+
+    def _read_blob(self, image, data=None):
+        if self.images != 'blobs' or image['path'] is None:
+            return None
+        if image.get('archive'):
+            # Фотография есть только в архиве - берем байты, переданные конвейером
+            return data
+        if self.products_dir is None:
+            return None
+        try:
+            return (self.products_dir / image['path']).read_bytes()
+        except OSError:
+            return None
+
+    def write(self, record, image_data=None):
+        """image_data - байты фотографий в порядке record['images'], если файлов нет на диске"""
+        image_data = image_data or [None] * len(record['images'])
+        # Фотографии читаются вне блокировки, чтобы не задерживать другие потоки
+        images = [(index, image['url'], image['path'], image.get('archive'),
+                   self._read_blob(image, data))
+                  for index, (image, data) in enumerate(zip(record['images'], image_data))]
+        with self._lock:
+            self._pending.append((record, images))
+            self.count += 1
+            if len(self._pending) >= self.batch_size:
+                self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+    def _commit(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO products (article, name, vendor, model, category_id,"
+                " price, oldprice, sizes, params, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(record['article'], record['name'], record['vendor'],
+                  record['params'].get('Модель'), record['category_id'],
+                  self._to_float(record['price']), self._to_float(record['oldprice']),
+                  json.dumps(record['sizes'], ensure_ascii=False),
+                  json.dumps(record['params'], ensure_ascii=False), now)
+                 for record, _ in pending]
+            )
+            self._db.executemany("DELETE FROM images WHERE article = ?",
+                                 [(record['article'],) for record, _ in pending])
+            self._db.executemany(
+                "INSERT INTO images (article, position, url, path, archive, data)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(record['article'], index, url, path, archive, data)
+                 for record, images in pending for index, url, path, archive, data in images]
+            )
+
+class ProductExporter:
+    """Потоковая выгрузка обработанных товаров в один файл JSONL или CSV либо в таблицу SQLite.
+
+    Записи копятся в буфере и дописываются в файл пачками по мере
+    поступления результатов.
+    """
+
+    FORMATS = {'jsonl': 'JSONL', 'csv': 'CSV', 'sqlite': 'SQLite'}
+    CSV_COLUMNS = ['article', 'name', 'price', 'oldprice', 'vendor', 'category_id',
+                   'sizes', 'image_paths', 'image_urls', 'params']
+
+    def __init__(self, path, fmt, buffer_size=500):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+        self.path = Path(path)
+        self.format = fmt
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._file = None
+        self._csv = None
+        self._store = None
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fmt == 'sqlite':
+            self._store = ProductStore(self.path, batch_size=buffer_size)
+        else:
+            new_file = not self.path.exists()
+            self._file = open(self.path, 'a', encoding='utf-8', newline='')
+            if fmt == 'csv':
+                self._csv = csv.writer(self._file)
+                if new_file:
+                    self._csv.writerow(self.CSV_COLUMNS)
+
+    @classmethod
+    def for_batch(cls, fmt, exports_dir=Path("exports")):
+        extension = 'db' if fmt == 'sqlite' else fmt
+        return cls(exports_dir / f"batch_{time.strftime('%Y-%m-%d_%H-%M-%S')}.{extension}", fmt)
+
+    def write(self, record, image_data=None):
+        if self._store is not None:
+            self._store.write(record, image_data)
+            self.count = self._store.count
+            return
+        with self._lock:
+            self._buffer.append(record)
+            self.count += 1
+            if len(self._buffer) >= self.buffer_size:
+                self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+        if self._store is not None:
+            self._store.close()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        records, self._buffer = self._buffer, []
+        if self.format == 'jsonl':
+            self._file.write(''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                                     for record in records))
+            self._file.flush()
+        else:
+            self._csv.writerows([
+                record['article'], record['name'], record['price'], record['oldprice'],
+                record['vendor'], record['category_id'],
+                '; '.join(size or '' for size in record['sizes']),
+                '; '.join(image['path'] or '' for image in record['images']),
+                '; '.join(image['url'] for image in record['images']),
+                json.dumps(record['params'], ensure_ascii=False),
+            ] for record in records)
+            self._file.flush()
+
+def file_digest(path):
+    """Размер и sha256 файла или None, если файла нет; вызывается и в отдельных процессах"""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+                size += len(chunk)
+    except OSError:
+        return None
+    return size, digest.hexdigest()
+
+class RunManifest:
+    """Манифест запуска в products/.runs: по строке JSON на каждую фотографию.
+
+    Строка содержит артикул, URL, путь относительно products, размер и
+    sha256; у незагруженных фотографий размер и хэш пустые.
+    """
+
+    RUNS_DIR = '.runs'
+
+    def __init__(self, path, layout):
+        self.path = Path(path)
+        self.layout = layout
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    @classmethod
+    def for_run(cls, layout):
+        name = f"run_{time.strftime('%Y-%m-%d_%H-%M-%S')}.jsonl"
+        return cls(layout.products_dir / cls.RUNS_DIR / name, layout)
+
+    @classmethod
+    def latest(cls, layout):
+        runs = sorted((layout.products_dir / cls.RUNS_DIR).glob('run_*.jsonl'))
+        return runs[-1] if runs else None
+
+    @staticmethod
+    def read(path):
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    @staticmethod
+    def rewrite(path, entries):
+        tmp_path = Path(path).with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def relocate(cls, layout):
+        """Переписывает пути во всех манифестах после смены схемы папок"""
+        for path in (layout.products_dir / cls.RUNS_DIR).glob('run_*.jsonl'):
+            entries = cls.read(path)
+            for entry in entries:
+                filename = entry['path'].rsplit('/', 1)[-1]
+                entry['path'] = f"{layout.relative_dir(entry['article'])}/{filename}"
+            cls.rewrite(path, entries)
+
+    def write(self, record, image_data=None):
+        article = record['article']
+        name = product_name(record)
+        lines = ''.join(
+            json.dumps({
+                'article': article,
+                'url': image['url'],
+                'path': f"{self.layout.relative_dir(article)}/{image_filename(article, name, i)}",
+                'size': image['size'],
+                'sha256': image['sha256'],
+            }, ensure_ascii=False) + '\n'
+            for i, image in enumerate(record['images'], 1)
+        )
+        with self._lock:
+            self._file.write(lines)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class ManifestVerifier:
+    """Проверка файлов по манифесту запуска и повторная загрузка только испорченных.
+
+    Хэши пересчитываются параллельно в нескольких процессах, так что
+    проверка упирается в диск, а не в одно ядро процессора. Записи товаров,
+    которых уже нет в каталоге, считаются устаревшими и не докачиваются -
+    иначе проверка вернула бы папки, убранные очисткой.
+    """
+
+    def __init__(self, manifest_path, layout, catalog_index, journal=None, workers=None):
+        self.manifest_path = Path(manifest_path)
+        self.layout = layout
+        self.catalog_index = catalog_index
+        self.journal = journal
+        self.products_dir = layout.products_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.entries = RunManifest.read(self.manifest_path)
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def verify(self, on_progress=None):
+        """Сверяет файлы с манифестом; возвращает статистику со списком плохих записей"""
+        start_time = time.perf_counter()
+        stats = {'total': len(self.entries), 'ok': 0, 'missing': 0, 'truncated': 0,
+                 'corrupted': 0, 'failed': 0, 'stale': 0, 'bad': [], 'repaired': 0,
+                 'repair_errors': 0}
+        live = []
+        for entry in self.entries:
+            if self.catalog_index.get_offer(entry['article']) is None:
+                stats['stale'] += 1
+            else:
+                live.append(entry)
+        checked = [entry for entry in live if entry['sha256'] is not None]
+        # Фотографии, которые не скачались еще при загрузке, тоже стоит докачать
+        for entry in live:
+            if entry['sha256'] is None:
+                stats['failed'] += 1
+                stats['bad'].append(entry)
+
+        paths = [str(self.products_dir / entry['path']) for entry in checked]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            chunksize = max(1, len(paths) // (self.workers * 8))
+            digests = executor.map(file_digest, paths, chunksize=chunksize)
+            for i, (entry, digest) in enumerate(zip(checked, digests), 1):
+                if digest is None:
+                    stats['missing'] += 1
+                elif digest[0] != entry['size']:
+                    stats['truncated'] += 1
+                elif digest[1] != entry['sha256']:
+                    stats['corrupted'] += 1
+                else:
+                    stats['ok'] += 1
+                if digest is None or digest != (entry['size'], entry['sha256']):
+                    stats['bad'].append(entry)
+                if on_progress is not None and (i % 100 == 0 or i == len(paths)):
+                    on_progress(i, len(paths))
+        stats['duration'] = time.perf_counter() - start_time
+        return stats
+
+    def repair(self, stats, downloader, on_progress=None):
+        """Заново скачивает плохие фотографии из stats и обновляет манифест"""
+        bad = stats['bad']
+        lock = threading.Lock()
+        writer = DiskWriter()
+        done = [0]
+
+        def make_callback(entry, path):
+            def finish(ok):
+                with lock:
+                    stats['repaired' if ok else 'repair_errors'] += 1
+                    done[0] += 1
+                    current = done[0]
+                if on_progress is not None:
+                    on_progress(current, len(bad))
+
+            def on_fetched(data, error, meta):
+                if data is None:
+                    finish(False)
+                    return
+
+                def on_written(ok):
+                    if ok:
+                        entry['size'] = len(data)
+                        entry['sha256'] = hashlib.sha256(data).hexdigest()
+                    finish(ok)
+
+                writer.submit(path, data, on_written)
+            return on_fetched
+
+        downloader.start()
+        writer.start()
+        try:
+            for entry in bad:
+                if self.cancelled.is_set():
+                    break
+                path = self.products_dir / entry['path']
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if self.journal is not None:
+                    self.journal.add(entry['article'])
+                downloader.submit(entry['url'], make_callback(entry, path))
+        finally:
+            downloader.close()
+            writer.close()
+        RunManifest.rewrite(self.manifest_path, self.entries)
+        return stats
+
+    @staticmethod
+    def format_stats(stats):
+        message = (f"🩺 Проверено файлов: {stats['total']}, в порядке {stats['ok']}, "
+                   f"нет на диске {stats['missing']}, обрезаны {stats['truncated']}, "
+                   f"повреждены {stats['corrupted']}, "
+                   f"не скачивались {stats['failed']} за {stats['duration']:.1f} с")
+        if stats['stale']:
+            message += f"\n🗑️ Товаров уже нет в каталоге, пропущено записей: {stats['stale']}"
+        if stats['repaired'] or stats['repair_errors']:
+            message += f"\n🔁 Скачано заново: {stats['repaired']}, ошибок {stats['repair_errors']}"
+        return message
+
+class ProductLayout:
+    """Расположение папок товаров внутри products.
+
+    depth = 0 - плоская схема products/<артикул>; depth > 0 - папка
+    артикула лежит под префиксами md5 от артикула, например
+    products/3f/a2/<артикул>. Схема хранится в products/.layout.json,
+    сменить ее у существующего дерева можно только миграцией.
+    """
+
+    LAYOUT_FILE = '.layout.json'
+
+    def __init__(self, products_dir, depth=0, width=2):
+        self.products_dir = Path(products_dir)
+        self.depth = depth
+        self.width = width
+        # Предупреждение о несовпадении схемы для показа пользователю (окно или консоль)
+        self.warning = None
+
+    @classmethod
+    def load(cls, products_dir):
+        products_dir = Path(products_dir)
+        try:
+            with open(products_dir / cls.LAYOUT_FILE, encoding='utf-8') as f:
+                settings = json.load(f)
+            return cls(products_dir, settings.get('depth', 0), settings.get('width', 2))
+        except (OSError, ValueError):
+            pass
+
+        layout = cls(products_dir, int(os.getenv('PARSER_LAYOUT_DEPTH', 0)))
+        if layout.depth and cls(products_dir).scan_articles():
+            # Уже есть плоское дерево - его нужно перевести миграцией, а не молча потерять
+            flat = cls(products_dir)
+            flat.warning = ("⚠️ Папка products уже содержит товары в плоской схеме, "
+                            "для перехода запустите: python main.py migrate-layout --depth N")
+            return flat
+        if layout.depth:
+            layout.save()
+        return layout
+
+    def save(self):
+        self.products_dir.mkdir(exist_ok=True)
+        with open(self.products_dir / self.LAYOUT_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'depth': self.depth, 'width': self.width}, f)
+
+    def relative_dir(self, article):
+        """Путь к папке артикула относительно products (через /)"""
+        if not self.depth:
+            return article
+        digest = hashlib.md5(article.encode('utf-8')).hexdigest()
+        shards = [digest[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return '/'.join(shards + [article])
+
+    def product_dir(self, article):
+        return self.products_dir / self.relative_dir(article)
+
+    def scan_articles(self):
+        """Находит папки артикулов на диске: артикул -> путь (служебные папки пропускаются)"""
+        level = [self.products_dir] if self.products_dir.exists() else []
+        for _ in range(self.depth):
+            level = [Path(entry.path) for directory in level for entry in os.scandir(directory)
+                     if entry.is_dir() and not entry.name.startswith('.')]
+        articles = {}
+        for directory in level:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        articles[entry.name] = Path(entry.path)
+        return articles
+
+    def migrate(self, depth, on_progress=None):
+        """Переносит все папки артикулов в схему с новой глубиной и возвращает новую схему"""
+        target = ProductLayout(self.products_dir, depth, self.width)
+        current = self.scan_articles()
+
+        if depth:
+            # Артикул вида "3f" совпал бы с именем папки-префикса
+            conflicts = [article for article in current
+                         if len(article) == self.width
+                         and all(c in '0123456789abcdef' for c in article)]
+            if conflicts:
+                raise ValueError("Артикулы совпадают с именами папок-префиксов: "
+                                 f"{', '.join(conflicts[:10])}")
+
+        moved = 0
+        old_parents = set()
+        for i, (article, path) in enumerate(current.items(), 1):
+            new_path = target.product_dir(article)
+            if new_path != path:
+                new_path.parent.mkdir(parents=True, exist_ok=True)
+                os.rename(path, new_path)
+                old_parents.add(path.parent)
+                moved += 1
+            if on_progress is not None:
+                on_progress(i, len(current))
+
+        # Убираем опустевшие папки-префиксы старой схемы снизу вверх
+        for directory in sorted(old_parents, key=lambda p: len(p.parts), reverse=True):
+            while directory != self.products_dir:
+                try:
+                    directory.rmdir()
+                except OSError:
+                    break
+                directory = directory.parent
+
+        target.save()
+        CatalogMirror.relocate_state(target)
+        ProductStore.relocate(target)
+        RunManifest.relocate(target)
+        return target, moved
+
+class ProductJournal:
+    """Журнал папок товаров в products: добавленные и удаленные артикулы.
+
+    Ведется дозаписью в products/.journal, поэтому очистка узнает состав
+    папки без обхода файлов. При первом запуске журнал строится по одному
+    списку каталогов products.
+    """
+
+    FILE_NAME = '.journal'
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.products_dir = layout.products_dir
+        self._articles = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self.products_dir / self.FILE_NAME
+
+    @property
+    def articles(self):
+        with self._lock:
+            self._load()
+            return set(self._articles)
+
+    def _load(self):
+        if self._articles is not None:
+            return
+        self._articles = set()
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    operation, article = line[:1], line[1:].rstrip('\n')
+                    if operation == '+':
+                        self._articles.add(article)
+                    elif operation == '-':
+                        self._articles.discard(article)
+            return
+        # Журнала еще нет: один проход по списку папок без stat каждого файла
+        self._articles = set(self.layout.scan_articles())
+        self._rewrite()
+
+    def _rewrite(self):
+        self.products_dir.mkdir(exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for article in sorted(self._articles):
+                f.write(f"+{article}\n")
+        os.replace(tmp_path, self.path)
+
+    def add(self, article):
+        with self._lock:
+            self._load()
+            if article in self._articles:
+                return
+            self._articles.add(article)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(f"+{article}\n")
+
+    def remove(self, articles):
+        with self._lock:
+            self._load()
+            self._articles.difference_update(articles)
+            # Удаление пишем сжатием журнала, чтобы он не рос бесконечно
+            self._rewrite()
+
+class ProductGarbageCollector:
+    """Находит и убирает папки товаров, которых больше нет в каталоге"""
+
+    MODES = {
+        'dry-run': 'Только показать',
+        'archive': 'Перенести в архив',
+        'delete': 'Удалить',
+    }
+    ARCHIVE_DIR = '.archive'
+
+    def __init__(self, catalog_index, journal, layout):
+        self.catalog_index = catalog_index
+        self.journal = journal
+        self.layout = layout
+        self.products_dir = layout.products_dir
+
+    def find_stale(self):
+        # Сравниваем журнал с индексом каталога - файлы при этом не читаются
+        return sorted(article for article in self.journal.articles
+                      if self.catalog_index.get_offer(article) is None)
+
+    def collect(self, mode='dry-run', on_progress=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Неизвестный режим очистки: {mode}")
+        stale = self.find_stale()
+        stats = {'mode': mode, 'stale': len(stale), 'processed': 0, 'missing': 0, 'errors': 0,
+                 'articles': stale, 'archive_dir': None}
+        if mode == 'dry-run':
+            return stats
+
+        if mode == 'archive':
+            archive_dir = self.products_dir / self.ARCHIVE_DIR / time.strftime('%Y-%m-%d_%H-%M-%S')
+            archive_dir.mkdir(parents=True, exist_ok=True)
+            stats['archive_dir'] = archive_dir
+
+        removed = []
+        for i, article in enumerate(stale, 1):
+            product_dir = self.layout.product_dir(article)
+            try:
+                if mode == 'archive':
+                    # В пределах одного диска это просто переименование
+                    shutil.move(str(product_dir), str(archive_dir / article))
+                else:
+                    shutil.rmtree(product_dir)
+                stats['processed'] += 1
+                removed.append(article)
+            except FileNotFoundError:
+                # Папку уже удалили вручную - просто забываем о ней
+                stats['missing'] += 1
+                removed.append(article)
+            except OSError:
+                stats['errors'] += 1
+            if on_progress is not None:
+                on_progress(i, len(stale))
+
+        self.journal.remove(removed)
+        return stats
+
+    @staticmethod
+    def format_stats(stats):
+        if stats['mode'] == 'dry-run':
+            sample = ', '.join(stats['articles'][:20])
+            more = f" и еще {stats['stale'] - 20}" if stats['stale'] > 20 else ''
+            message = f"🧹 Устаревших папок: {stats['stale']}"
+            return message + (f" ({sample}{more})" if sample else '')
+        action = 'перенесено в архив' if stats['mode'] == 'archive' else 'удалено'
+        message = (f"🧹 Устаревших папок: {stats['stale']}, {action} {stats['processed']}, "
+                   f"уже отсутствовали {stats['missing']}, ошибок {stats['errors']}")
+        if stats['archive_dir'] is not None:
+            message += f"\n📦 Архив: {stats['archive_dir']}"
+        return message
+
+class CatalogMirror:
+    """Инкрементальное зеркало фотографий всего каталога в папке products.
+
+    Состояние прошлой синхронизации (URL -> файл и валидаторы) хранится
+    в products/.mirror.json. Скачивается только новое и изменившееся,
+    фотографии товаров, ушедших из фида, удаляются.
+    """
+
+    STATE_FILE = '.mirror.json'
+
+    def __init__(self, catalog_index, product_cache, layout, downloader,
+                 revalidate=False, prune=True, write_buffer_bytes=64 * 1024 * 1024, journal=None):
+        self.catalog_index = catalog_index
+        self.product_cache = product_cache
+        self.layout = layout
+        self.products_dir = layout.products_dir
+        self.downloader = downloader
+        self.journal = journal
+        self.revalidate = revalidate
+        self.prune = prune
+        self.writer = DiskWriter(2, write_buffer_bytes)
+        self.cancelled = threading.Event()
+        self.state = {}
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def state_path(self):
+        return self.products_dir / self.STATE_FILE
+
+    def load_state(self):
+        return self.read_state(self.state_path)
+
+    def save_state(self):
+        self.write_state(self.state_path, self.state)
+
+    @staticmethod
+    def read_state(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def write_state(path, state):
+        # Пишем во временный файл и подменяем, чтобы не потерять состояние при сбое
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def relocate_state(cls, layout):
+        """Переписывает пути в состоянии зеркала после смены схемы папок"""
+        path = layout.products_dir / cls.STATE_FILE
+        if not path.exists():
+            return
+        state = cls.read_state(path)
+        for entry in state.values():
+            filename = entry['path'].rsplit('/', 1)[-1]
+            entry['path'] = f"{layout.relative_dir(entry['article'])}/{filename}"
+        cls.write_state(path, state)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def desired_images(self):
+        """URL -> (артикул, относительный путь) для всех фотографий текущего каталога"""
+        desired = {}
+        for article in self.catalog_index.offers:
+            product = self.product_cache.get(article)
+            if product is None:
+                continue
+            name = product_name(product)
+            for i, url in enumerate(product['images'], 1):
+                filename = image_filename(article, name, i)
+                relative_path = f"{self.layout.relative_dir(article)}/{filename}"
+                desired.setdefault(url, (article, relative_path))
+        return desired
+
+    def sync(self, on_progress=None):
+        """Синхронизирует зеркало и возвращает статистику; блокирует вызывающий поток"""
+        start_time = time.perf_counter()
+        self.products_dir.mkdir(exist_ok=True)
+        self.state = self.load_state()
+        desired = self.desired_images()
+        self._stats = {'total': len(desired), 'downloaded': 0, 'unchanged': 0, 'revalidated': 0,
+                       'pruned': 0, 'errors': 0, 'bytes': 0}
+
+        # Решаем, что качать, не трогая сеть
+        to_fetch = []
+        moved_paths = []
+        for url, (article, relative_path) in desired.items():
+            entry = self.state.get(url)
+            path = self.products_dir / relative_path
+            if entry is not None and entry['path'] != relative_path:
+                # Фотография перешла в другую папку - старый файл станет лишним
+                moved_paths.append(entry['path'])
+                entry = None
+            if entry is not None and path.exists():
+                if self.revalidate:
+                    to_fetch.append((url, article, relative_path, entry))
+                else:
+                    self._stats['unchanged'] += 1
+            elif entry is None and path.exists() and path.stat().st_size > 0:
+                # Файл уже скачан раньше (без зеркала) - принимаем его как есть; время
+                # изменения файла служит валидатором для условного запроса при перепроверке
+                stat = path.stat()
+                self.state[url] = {'article': article, 'path': relative_path,
+                                   'size': stat.st_size, 'etag': None,
+                                   'last_modified': email.utils.formatdate(stat.st_mtime,
+                                                                           usegmt=True)}
+                self._stats['unchanged'] += 1
+            else:
+                to_fetch.append((url, article, relative_path, None))
+
+        total = len(to_fetch)
+        done = [0]
+
+        def finish_one():
+            with self._lock:
+                done[0] += 1
+                current = done[0]
+            if on_progress is not None:
+                on_progress(current, total)
+
+        self.downloader.start()
+        self.writer.start()
+        try:
+            for url, article, relative_path, entry in to_fetch:
+                if self.cancelled.is_set():
+                    break
+                path = self.products_dir / relative_path
+                path.parent.mkdir(parents=True, exist_ok=True)
+                if self.journal is not None:
+                    self.journal.add(article)
+                headers = None
+                if entry:
+                    headers = Downloader.conditional_headers(entry.get('etag'),
+                                                             entry.get('last_modified'))
+                callback = self._make_callback(url, article, relative_path, finish_one)
+                self.downloader.submit(url, callback, headers)
+        finally:
+            self.downloader.close()
+            self.writer.close()
+
+        if self.prune and not self.cancelled.is_set():
+            self._prune(desired, moved_paths)
+        self.save_state()
+
+        self._stats['duration'] = time.perf_counter() - start_time
+        self._stats['fetch_latency'] = self.downloader.stats()['fetch_latency']
+        self._stats['engine'] = self.downloader.name
+        return dict(self._stats)
+
+    def _make_callback(self, url, article, relative_path, finish_one):
+        def on_fetched(data, error, meta):
+            if error is not None:
+                with self._lock:
+                    self._stats['errors'] += 1
+                finish_one()
+                return
+            if data is None:
+                # 304: файл на сервере не изменился, запоминаем выданные сервером валидаторы
+                with self._lock:
+                    entry = self.state.get(url)
+                    if entry is not None:
+                        for key in ('etag', 'last_modified'):
+                            if meta.get(key):
+                                entry[key] = meta[key]
+                    self._stats['revalidated'] += 1
+                finish_one()
+                return
+
+            def on_written(ok):
+                with self._lock:
+                    if ok:
+                        self.state[url] = {
+                            'article': article,
+                            'path': relative_path,
+                            'size': len(data),
+                            'etag': meta.get('etag'),
+                            'last_modified': meta.get('last_modified'),
+                        }
+                        self._stats['downloaded'] += 1
+                        self._stats['bytes'] += len(data)
+                    else:
+                        self._stats['errors'] += 1
+                finish_one()
+
+            self.writer.submit(self.products_dir / relative_path, data, on_written)
+        return on_fetched
+
+    def _prune(self, desired, moved_paths):
+        desired_paths = {relative_path for _, relative_path in desired.values()}
+        stale_paths = list(moved_paths)
+        for url in [url for url in self.state if url not in desired]:
+            stale_paths.append(self.state.pop(url)['path'])
+
+        stale_dirs = set()
+        for relative_path in stale_paths:
+            # Путь мог перейти к новому URL той же фотографии - такой файл не трогаем
+            if relative_path in desired_paths:
+                continue
+            path = self.products_dir / relative_path
+            try:
+                path.unlink()
+                self._stats['pruned'] += 1
+            except FileNotFoundError:
+                pass
+            stale_dirs.add(path.parent)
+        for directory in stale_dirs:
+            try:
+                directory.rmdir()  # удаляется только пустая папка
+            except OSError:
+                pass
+
+    @staticmethod
+    def format_stats(stats):
+        duration = max(stats['duration'], 1e-6)
+        return (
+            f"🔄 Зеркало ({stats['engine']}): фотографий в каталоге {stats['total']}, "
+            f"скачано {stats['downloaded']}, "
+            f"без изменений {stats['unchanged'] + stats['revalidated']}, "
+            f"удалено {stats['pruned']}, ошибок {stats['errors']}\n"
+            f"⏱️ {duration:.1f} с, {stats['downloaded'] / duration:.1f} файлов/с, "
+            f"{stats['bytes'] / 1048576 / duration:.2f} МБ/с"
+        )
+
+def resource_path(relative):
+    """Путь к файлу из поставки: распакованная сборка PyInstaller или папка с main.py"""
+    base = getattr(sys, '_MEIPASS', None) or Path(__file__).resolve().parent
+    return Path(base) / relative
 
 class FontManager:
+    """Шрифт приложения без обращения к сети при запуске.
+
+    Файл ищется в ресурсах сборки, в папке fonts рабочего каталога и в кэше
+    PARSER_FONT_DIR; в Qt регистрируется только нужный файл и только при
+    первом обращении. Если шрифта нет нигде, download_font скачивает его
+    в кэш - вызывается из фонового потока FontDownloader.
+    """
+
+    FONT_FILE = "Montserrat-Regular.ttf"
+    FONT_URL = "https://github.com/google/fonts/raw/main/ofl/montserrat/Montserrat-Regular.ttf"
+    FALLBACK_FAMILY = "Segoe UI"
+    DOWNLOAD_TIMEOUT = 15
+    # путь к файлу -> семейство (None, если Qt не смог прочитать файл)
+    _families = {}
+
     @staticmethod
-    def setup_fonts():
-        # Создаем папку для шрифтов, если её нет
-        fonts_dir = Path("fonts")
-        fonts_dir.mkdir(exist_ok=True)
-        
-        # Путь к файлу шрифта Montserrat
-        montserrat_path = fonts_dir / "Montserrat-Regular.ttf"
-        
-        # Скачиваем шрифт, если его нет
-        if not montserrat_path.exists():
-            try:
-                url = "https://github.com/google/fonts/raw/main/ofl/montserrat/Montserrat-Regular.ttf"
-                response = requests.get(url)
-                response.raise_for_status()
-                
-                with open(montserrat_path, 'wb') as f:
-                    f.write(response.content)
-                    
-                print("✅ Шрифт Montserrat успешно загружен")
-            except Exception as e:
-                print(f"❌ Ошибка загрузки шрифта: {str(e)}")
-                return None
-        
-        # Загружаем шрифт в приложение
-        font_id = QFontDatabase.addApplicationFont(str(montserrat_path))
-        if font_id != -1:
-            return QFontDatabase.applicationFontFamilies(font_id)[0]
+    def cache_dir():
+        return Path(os.getenv('PARSER_FONT_DIR', '.cache/fonts'))
+
+    @classmethod
+    def find_font(cls, name=None):
+        name = name or cls.FONT_FILE
+        for directory in (resource_path('fonts'), Path('fonts'), cls.cache_dir()):
+            path = directory / name
+            if path.is_file():
+                return path
         return None
 
+    @classmethod
+    def register(cls, path):
+        key = str(path)
+        if key not in cls._families:
+            font_id = QFontDatabase.addApplicationFont(key)
+            families = QFontDatabase.applicationFontFamilies(font_id) if font_id != -1 else []
+            cls._families[key] = families[0] if families else None
+        return cls._families[key]
+
+    @classmethod
+    def setup_fonts(cls):
+        """Семейство локального шрифта или None, если файла нет"""
+        path = cls.find_font()
+        return cls.register(path) if path is not None else None
+
+    @classmethod
+    def download_font(cls, timeout=None):
+        """Скачивает шрифт в кэш и возвращает путь; файл появляется только целиком"""
+        target = cls.cache_dir() / cls.FONT_FILE
+        target.parent.mkdir(parents=True, exist_ok=True)
+        response = requests.get(cls.FONT_URL, timeout=timeout or cls.DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        temp_path = target.with_name(target.name + '.part')
+        temp_path.write_bytes(response.content)
+        os.replace(temp_path, target)
+        cls._families.pop(str(target), None)
+        return target
+
+class FontDownloader(QObject):
+    """Фоновая докачка шрифта; путь к файлу приходит сигналом loaded в поток интерфейса"""
+
+    loaded = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loading = False
+
+    def start(self):
+        if self.loading:
+            return
+        self.loading = True
+        threading.Thread(target=self._run, name="font-downloader", daemon=True).start()
+
+    def _run(self):
+        try:
+            with STARTUP_TRACE.span('font.download', 'background'):
+                path = FontManager.download_font()
+        except Exception as e:
+            self.loading = False
+            self.failed.emit(str(e))
+            return
+        self.loading = False
+        self.loaded.emit(str(path))
+
 class ModernFrame(QFrame):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -124,9 +2413,16 @@ class ModernSplashScreen(QSplashScreen):
         self.animation.setEasingCurve(QEasingCurve.InOutQuad)
         self.animation.start()
         
+    def set_progress(self, done, total):
+        """Переключает полосу из бесконечной анимации в настоящий прогресс"""
+        if self.animation.state() == QPropertyAnimation.Running:
+            self.animation.stop()
+            self.status_bar.setRange(0, 1000)
+        self.status_bar.setValue(int(done * 1000 / total) if total else 0)
+
     def showMessage(self, message, alignment=Qt.AlignCenter, color=Qt.white):
+        # Сообщения приходят из цикла событий, processEvents здесь больше не нужен
         self.status_label.setText(message)
-        QApplication.processEvents()
         
     def mousePressEvent(self, event):
         pass  # Предотвращаем закрытие сплэш-скрина по клику
@@ -154,9 +2450,363 @@ class FadeInWidget(QWidget):
         super().showEvent(event)
         self.animation.start()
 
+class LogView(QPlainTextEdit):
+    """Журнал для больших пакетов: простой текст вместо rich text.
+
+    Сообщения копятся в буфере и добавляются одной вставкой по таймеру,
+    число строк ограничено, а полный журнал при желании дописывается в файл.
+    """
+
+    def __init__(self, max_lines=5000, flush_interval=100, spill_path=None, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setMaximumBlockCount(max_lines)
+        self.spill_path = Path(spill_path) if spill_path else None
+        self._pending = []
+        self._spill_file = None
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def append(self, message):
+        self._pending.append(message)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        text = '\n'.join(self._pending)
+        self._pending = []
+        if self.spill_path is not None:
+            if self._spill_file is None:
+                self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+                self._spill_file = open(self.spill_path, 'a', encoding='utf-8')
+            self._spill_file.write(f"{text}\n")
+            self._spill_file.flush()
+        # Прокручиваем вниз, только если пользователь не листает журнал выше
+        scroll_bar = self.verticalScrollBar()
+        at_bottom = scroll_bar.value() >= scroll_bar.maximum() - 4
+        self.appendPlainText(text)
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def clear(self):
+        # Файл журнала не трогаем: очистка касается только экрана
+        self.flush()
+        super().clear()
+
+    def close_spill(self):
+        self.flush()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+class ThumbnailCache:
+    """Общий для всех окон LRU-кэш миниатюр с бюджетом в байтах.
+
+    QPixmap можно создавать и трогать только в GUI-потоке, поэтому кэш
+    не защищен блокировкой и используется только оттуда.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._pixmaps = OrderedDict()
+
+    @staticmethod
+    def _size(pixmap):
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+    def get(self, key):
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self._pixmaps:
+            self.bytes -= self._size(self._pixmaps.pop(key))
+        self._pixmaps[key] = pixmap
+        self.bytes += self._size(pixmap)
+        # Самые давно не использованные миниатюры вытесняются первыми
+        while self.bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self.bytes -= self._size(evicted)
+
+class ThumbnailDiskCache:
+    """Постоянный кэш уменьшенных миниатюр на диске.
+
+    Ключ - URL фотографии; рядом с миниатюрой хранятся валидаторы ответа
+    (ETag, Last-Modified). Свежая запись используется без обращения к сети,
+    устаревшая проверяется условным запросом. Общий объём ограничен, первыми
+    вытесняются давно не открывавшиеся миниатюры. Индекс лежит в index.json;
+    при открытии папка сверяется с ним, и файлы, записанные после последнего
+    сохранения индекса (например, перед аварийным завершением), удаляются.
+    """
+
+    INDEX_FILE = 'index.json'
+    # Индекс сохраняется не на каждую запись, а раз в несколько добавлений и при закрытии
+    SAVE_EVERY = 20
+
+    def __init__(self, cache_dir, max_bytes=256 * 1024 * 1024, max_age=30 * 24 * 3600):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index = self._read_index()
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reconcile()
+        self.bytes = sum(entry['size'] for entry in self.index.values())
+        # Лимит могли уменьшить с прошлого запуска
+        self._remove_files(self._evict())
+
+    def _path(self, key):
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def _read_index(self):
+        try:
+            with open(self.cache_dir / self.INDEX_FILE, encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return index if isinstance(index, dict) else {}
+
+    def _write_index(self, index):
+        path = self.cache_dir / self.INDEX_FILE
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def _reconcile(self):
+        """Удаляет файлы без записи в индексе и записи без файлов"""
+        found = set()
+        for directory in self.cache_dir.iterdir():
+            if not directory.is_dir():
+                continue
+            for path in directory.iterdir():
+                key = path.stem
+                if path.suffix == '.jpg' and key in self.index:
+                    found.add(key)
+                    continue
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+        missing = [key for key in self.index if key not in found]
+        for key in missing:
+            del self.index[key]
+        if missing:
+            self._unsaved = 1
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        """Возвращает (данные миниатюры, запись индекса) или None"""
+        key = self._key(url)
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is None:
+                return None
+            entry['used'] = time.time()
+        try:
+            return self._path(key).read_bytes(), dict(entry)
+        except OSError:
+            with self._lock:
+                removed = self.index.pop(key, None)
+                if removed is not None:
+                    self.bytes -= removed['size']
+            return None
+
+    def is_fresh(self, entry):
+        return time.time() - entry['checked'] < self.max_age
+
+    def touch(self, url):
+        """Отмечает, что сервер подтвердил миниатюру (ответ 304)"""
+        with self._lock:
+            entry = self.index.get(self._key(url))
+            if entry is not None:
+                entry['checked'] = time.time()
+
+    def put(self, url, data, etag=None, last_modified=None):
+        key = self._key(url)
+        path = self._path(key)
+        try:
+            path.parent.mkdir(exist_ok=True)
+            path.write_bytes(data)
+        except OSError:
+            return
+        now = time.time()
+        with self._lock:
+            previous = self.index.get(key)
+            if previous is not None:
+                self.bytes -= previous['size']
+            self.index[key] = {'url': url, 'size': len(data), 'etag': etag,
+                               'last_modified': last_modified, 'checked': now, 'used': now}
+            self.bytes += len(data)
+            evicted = self._evict()
+            self._unsaved += 1
+            save = self._unsaved >= self.SAVE_EVERY
+        self._remove_files(evicted)
+        if save:
+            self.flush()
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                self._path(key).unlink()
+            except OSError:
+                pass
+
+    def _evict(self):
+        if self.bytes <= self.max_bytes:
+            return []
+        evicted = []
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]['used']):
+            if self.bytes <= self.max_bytes:
+                break
+            del self.index[key]
+            self.bytes -= entry['size']
+            evicted.append(key)
+        return evicted
+
+    def flush(self):
+        # Несколько потоков загрузки могут сохранять индекс одновременно - общий index.tmp
+        with self._flush_lock:
+            with self._lock:
+                index = {key: dict(entry) for key, entry in self.index.items()}
+                self._unsaved = 0
+            try:
+                self._write_index(index)
+            except OSError:
+                pass
+
+class ImageLoader(QObject):
+    """Загрузка и уменьшение фотографий в ограниченном пуле потоков.
+
+    Сеть, декодирование и масштабирование идут в рабочих потоках на QImage,
+    а готовая картинка передается в GUI-поток сигналом loaded. Один и тот
+    же URL одновременно загружается только один раз. С disk_cache уже
+    виденные миниатюры читаются с диска без сети и без декодирования
+    полноразмерной фотографии.
+    """
+
+    loaded = Signal(str, QImage)
+    failed = Signal(str, str)
+
+    def __init__(self, headers=None, workers=4, thumbnail_size=200, disk_cache=None,
+                 raw_cache_bytes=32 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.thumbnail_size = thumbnail_size
+        self.disk_cache = disk_cache
+        # Последние скачанные оригиналы: «Скачать все» берет их отсюда, а не из сети
+        self.raw_cache_bytes = raw_cache_bytes
+        self._raw = OrderedDict()
+        self._raw_bytes = 0
+        self.session = requests.Session()
+        self.session.headers.update(headers or DEFAULT_HEADERS)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers,
+                                                               thread_name_prefix="image-loader")
+        self._in_flight = {}  # URL -> [future, число ожидающих окон]
+        self._lock = threading.Lock()
+
+    def request(self, url):
+        with self._lock:
+            entry = self._in_flight.get(url)
+            if entry is not None:
+                entry[1] += 1
+                return
+            entry = self._in_flight[url] = [None, 1]
+            entry[0] = self._executor.submit(self._load, url)
+
+    def cancel(self, url):
+        """Снимает запрос окна; загрузка отменяется, если URL больше не нужен и еще не начата"""
+        with self._lock:
+            entry = self._in_flight.get(url)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0 and entry[0].cancel():
+                del self._in_flight[url]
+
+    def raw_data(self, url):
+        """Оригинал фотографии, если он недавно скачивался для миниатюры"""
+        with self._lock:
+            data = self._raw.get(url)
+            if data is not None:
+                self._raw.move_to_end(url)
+            return data
+
+    def _remember_raw(self, url, data):
+        with self._lock:
+            if url in self._raw:
+                self._raw_bytes -= len(self._raw.pop(url))
+            self._raw[url] = data
+            self._raw_bytes += len(data)
+            while self._raw_bytes > self.raw_cache_bytes and self._raw:
+                _, evicted = self._raw.popitem(last=False)
+                self._raw_bytes -= len(evicted)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.disk_cache is not None:
+            self.disk_cache.flush()
+
+    def _fetch_thumbnail(self, url):
+        cached = self.disk_cache.get(url) if self.disk_cache is not None else None
+        if cached is not None and self.disk_cache.is_fresh(cached[1]):
+            return QImage.fromData(cached[0])
+
+        headers = None
+        if cached is not None:
+            entry = cached[1]
+            headers = Downloader.conditional_headers(entry.get('etag'), entry.get('last_modified'))
+        response = self.session.get(url, headers=headers, timeout=30)
+        if response.status_code == 304 and cached is not None:
+            self.disk_cache.touch(url)
+            return QImage.fromData(cached[0])
+        response.raise_for_status()
+        self._remember_raw(url, response.content)
+
+        image = QImage()
+        if not image.loadFromData(response.content):
+            raise ValueError("не удалось декодировать изображение")
+        image = image.scaled(self.thumbnail_size, self.thumbnail_size,
+                             Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        if self.disk_cache is not None:
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, 'JPG', 90)
+            self.disk_cache.put(url, bytes(buffer.data()), response.headers.get('ETag'),
+                                response.headers.get('Last-Modified'))
+        return image
+
+    def _load(self, url):
+        try:
+            image = self._fetch_thumbnail(url)
+            if image.isNull():
+                raise ValueError("не удалось декодировать изображение")
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(url, None)
+            self.failed.emit(url, str(e))
+            return
+        with self._lock:
+            self._in_flight.pop(url, None)
+        self.loaded.emit(url, image)
+
 class SearchWindow(QMainWindow):
     def __init__(self, product_data, parent=None):
         super().__init__(parent)
+        # Закрытое окно удаляется, а не копится среди дочерних окон приложения
+        self.setAttribute(Qt.WA_DeleteOnClose)
         self.product_data = product_data
         self.setWindowTitle(f"Товар {product_data.get('Артикул', '')}")
         self.setMinimumSize(800, 600)
@@ -183,6 +2833,17 @@ class SearchWindow(QMainWindow):
             QScrollArea {
                 border: none;
             }
+            QProgressBar {
+                border: 1px solid #404040;
+                border-radius: 4px;
+                text-align: center;
+                color: white;
+                background-color: #2C2C2C;
+            }
+            QProgressBar::chunk {
+                background-color: #007AFF;
+                border-radius: 3px;
+            }
         """)
         
         # Create central widget and layout
@@ -237,11 +2898,21 @@ class SearchWindow(QMainWindow):
         # Scroll area for images
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
-        scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.scroll_area = scroll_area
         
         images_widget = QWidget()
         images_layout = QHBoxLayout(images_widget)
         
+        # Миниатюры приходят из общего загрузчика через сигналы
+        # и запрашиваются только тогда, когда их рамка попадает в видимую область
+        self.image_labels = {}
+        self.unloaded_images = []
+        self.parent().image_loader.loaded.connect(self.on_image_loaded)
+        self.parent().image_loader.failed.connect(self.on_image_failed)
+        scroll_area.horizontalScrollBar().valueChanged.connect(self.load_visible_images)
+        
         # Add images
         for image_url in product_data.get('images', []):
             image_frame = QFrame()
@@ -267,74 +2938,675 @@ class SearchWindow(QMainWindow):
             image_layout.addWidget(download_btn)
             images_layout.addWidget(image_frame)
             
-            # Load image in background
-            self.load_image(image_url, image_label)
+            self.unloaded_images.append((image_url, image_label))
         
         scroll_area.setWidget(images_widget)
         layout.addWidget(scroll_area)
         
         # Download all button
-        download_all_btn = QPushButton("Скачать все фотографии")
-        download_all_btn.clicked.connect(self.download_all_images)
-        layout.addWidget(download_all_btn)
+        # Общий индикатор фоновой загрузки фотографий
+        self.download_progress = QProgressBar()
+        self.download_progress.setVisible(False)
+        layout.addWidget(self.download_progress)
+        self.download_signals = PipelineSignals()
+        self.download_signals.progress.connect(self.on_download_progress)
+        self.download_signals.finished.connect(self.on_download_finished)
+        self.downloading = False
+        
+        self.download_all_btn = QPushButton("Скачать все фотографии")
+        self.download_all_btn.clicked.connect(self.download_all_images)
+        layout.addWidget(self.download_all_btn)
+        
+        # Download whole model group button
+        model_group = self.parent().catalog_index.model_group(product_data.get('Артикул', ''))
+        download_model_btn = QPushButton(f"👟 Скачать всю модель ({len(model_group)} артикулов)")
+        download_model_btn.setEnabled(len(model_group) > 0)
+        download_model_btn.clicked.connect(self.download_model_group)
+        layout.addWidget(download_model_btn)
     
+    def showEvent(self, event):
+        super().showEvent(event)
+        # Геометрия рамок известна только после раскладки окна
+        QTimer.singleShot(0, self.load_visible_images)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.load_visible_images()
+
+    def closeEvent(self, event):
+        # Неначатые загрузки этого окна отменяем, остальные просто не ждем
+        loader = self.parent().image_loader
+        for url, labels in self.image_labels.items():
+            for _ in labels:
+                loader.cancel(url)
+        self.image_labels = {}
+        self.unloaded_images = []
+        # Общий загрузчик продолжает раздавать миниатюры другим окнам
+        loader.loaded.disconnect(self.on_image_loaded)
+        loader.failed.disconnect(self.on_image_failed)
+        super().closeEvent(event)
+
+    def load_visible_images(self):
+        if not self.unloaded_images or not self.isVisible():
+            return
+        viewport = self.scroll_area.viewport()
+        # Небольшой запас, чтобы соседняя миниатюра была готова до прокрутки к ней
+        visible = viewport.rect().adjusted(-100, 0, 100, 0)
+        remaining = []
+        for url, label in self.unloaded_images:
+            top_left = label.mapTo(viewport, QPoint(0, 0))
+            if visible.intersects(label.rect().translated(top_left)):
+                self.load_image(url, label)
+            else:
+                remaining.append((url, label))
+        self.unloaded_images = remaining
+
     def load_image(self, url, label):
-        def load():
-            try:
-                response = requests.get(url, headers=self.parent().headers)
-                image = QImage()
-                image.loadFromData(response.content)
-                pixmap = QPixmap.fromImage(image)
-                label.setPixmap(pixmap.scaled(200, 200, Qt.KeepAspectRatio, Qt.SmoothTransformation))
-            except Exception as e:
-                print(f"Error loading image: {str(e)}")
-        
-        # Run in background
-        import threading
-        threading.Thread(target=load).start()
+        pixmap = self.parent().thumbnail_cache.get(url)
+        if pixmap is not None:
+            label.setPixmap(pixmap)
+            return
+        self.image_labels.setdefault(url, []).append(label)
+        self.parent().image_loader.request(url)
+
+    def on_image_loaded(self, url, image):
+        # Закрытое окно больше ничего не ждет: image_labels пуст
+        labels = self.image_labels.pop(url, None)
+        if labels is None:
+            return
+        # Другое окно могло уже положить эту миниатюру в кэш
+        cache = self.parent().thumbnail_cache
+        pixmap = cache.get(url)
+        if pixmap is None:
+            pixmap = QPixmap.fromImage(image)
+            cache.put(url, pixmap)
+        for label in labels:
+            label.setPixmap(pixmap)
+
+    def on_image_failed(self, url, error):
+        for label in self.image_labels.pop(url, []):
+            label.setText("Не удалось\nзагрузить фото")
     
     def download_image(self, url):
+        self.download_images([url])
+    
+    def download_all_images(self):
+        self.download_images(self.product_data.get('images', []))
+    
+    def download_images(self, urls):
+        """Скачивает фотографии в фоне общим движком загрузки с одним индикатором прогресса"""
+        if self.downloading or not urls:
+            return
+        app = self.parent()
+        article = self.product_data.get('Артикул', '')
+        images_dir = app.product_layout.product_dir(article) / "images"
         try:
-            response = requests.get(url, headers=self.parent().headers)
-            filename = url.split('/')[-1]
-            save_path = Path("products") / self.product_data.get('article', '') / "images" / filename
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
-            
-            QMessageBox.information(self, "Успех", f"Фотография сохранена в {save_path}")
+            images_dir.mkdir(parents=True, exist_ok=True)
+            # Папку видит очистка устаревших товаров, как и папки массовой загрузки
+            app.journal.add(article)
+            downloader = create_downloader(app.engine_combo.currentData(), app.headers)
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось начать загрузку: {str(e)}")
+            return
+        targets = [(url, images_dir / url.split('/')[-1]) for url in dict.fromkeys(urls)]
+        self.downloading = True
+        self.download_all_btn.setEnabled(False)
+        self.download_progress.setMaximum(len(targets))
+        self.download_progress.setValue(0)
+        self.download_progress.setVisible(True)
+        threading.Thread(target=self._run_download, args=(targets, downloader, images_dir),
+                         daemon=True).start()
+
+    def _run_download(self, targets, downloader, images_dir):
+        loader = self.parent().image_loader
+        writer = DiskWriter()
+        lock = threading.Lock()
+        stats = {'total': len(targets), 'saved': 0, 'reused': 0, 'errors': 0, 'dir': images_dir,
+                 'error': None}
+        done = [0]
+
+        def finish(ok, reused=False):
+            with lock:
+                if ok:
+                    stats['saved'] += 1
+                    stats['reused'] += reused
+                else:
+                    stats['errors'] += 1
+                done[0] += 1
+                current = done[0]
+            self.download_signals.progress.emit(current, len(targets))
+
+        def make_callback(path):
+            def on_fetched(data, error, meta):
+                if data is None:
+                    finish(False)
+                    return
+                writer.submit(path, data, finish)
+            return on_fetched
+
+        # Закрываем только то, что успело запуститься; finished приходит в любом случае
+        started = []
+        try:
+            downloader.start()
+            started.append(downloader)
+            writer.start()
+            started.append(writer)
+            for url, path in targets:
+                # Оригинал мог уже прийти при загрузке миниатюры
+                data = loader.raw_data(url)
+                if data is not None:
+                    writer.submit(path, data, lambda ok: finish(ok, True))
+                else:
+                    downloader.submit(url, make_callback(path))
         except Exception as e:
-            QMessageBox.critical(self, "Ошибка", f"Не удалось скачать фотографию: {str(e)}")
+            stats['error'] = str(e)
+        finally:
+            for component in started:
+                try:
+                    component.close()
+                except Exception as e:
+                    stats['error'] = stats['error'] or str(e)
+            self.download_signals.finished.emit(stats)
+
+    def on_download_progress(self, done, total):
+        self.download_progress.setMaximum(total)
+        self.download_progress.setValue(done)
+
+    def on_download_finished(self, stats):
+        self.downloading = False
+        self.download_all_btn.setEnabled(True)
+        self.download_progress.setVisible(False)
+        message = f"Сохранено фотографий: {stats['saved']} из {stats['total']} в {stats['dir']}"
+        if stats['error']:
+            QMessageBox.critical(self, "Ошибка", f"Загрузка прервана: {stats['error']}\n{message}")
+            return
+        if stats['reused']:
+            message += f"\nБез повторной загрузки: {stats['reused']}"
+        if stats['errors']:
+            QMessageBox.warning(self, "Загрузка завершена с ошибками",
+                                f"{message}\nНе удалось скачать: {stats['errors']}")
+        else:
+            QMessageBox.information(self, "Успех", message)
     
-    def download_all_images(self):
-        for image_url in self.product_data.get('images', []):
-            self.download_image(image_url)
+    def download_model_group(self):
+        articles = self.parent().catalog_index.model_group(self.product_data.get('Артикул', ''))
+        self.parent().process_articles(list(articles))
+
+class AnalyticsWindow(QMainWindow):
+    def __init__(self, analytics, parent=None):
+        super().__init__(parent)
+        self.analytics = analytics
+        self.setWindowTitle(f"Аналитика каталога ({len(analytics)} товаров)")
+        self.setMinimumSize(800, 600)
+        self.setStyleSheet("""
+            QMainWindow {
+                background-color: #1A1A1A;
+            }
+            QLabel {
+                color: #FFFFFF;
+                font-size: 14px;
+            }
+            QPushButton {
+                background-color: #2C2C2C;
+                color: white;
+                border: 1px solid #404040;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-size: 14px;
+            }
+            QPushButton:hover {
+                background-color: #353535;
+                border: 1px solid #505050;
+            }
+            QComboBox, QSpinBox {
+                padding: 6px;
+                border: 1px solid #404040;
+                border-radius: 4px;
+                background-color: #2C2C2C;
+                color: white;
+                font-size: 14px;
+            }
+            QTableWidget {
+                background-color: #242424;
+                color: white;
+                gridline-color: #404040;
+                border: none;
+                font-size: 13px;
+            }
+            QHeaderView::section {
+                background-color: #2C2C2C;
+                color: white;
+                border: 1px solid #404040;
+                padding: 4px;
+            }
+        """)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        # Параметры отчёта
+        controls_layout = QHBoxLayout()
+
+        self.aggregate_combo = QComboBox()
+        for key, title in CatalogAnalytics.AGGREGATES.items():
+            self.aggregate_combo.addItem(title, key)
+
+        self.by_combo = QComboBox()
+        self.by_combo.addItem("Без группировки", None)
+        for field in CatalogAnalytics.GROUP_FIELDS:
+            self.by_combo.addItem(field, field)
+        self.by_combo.setCurrentIndex(1)
+
+        self.value_combo = QComboBox()
+        for key, title in CatalogAnalytics.VALUE_FIELDS.items():
+            self.value_combo.addItem(title, key)
+
+        self.bins_spin = QSpinBox()
+        self.bins_spin.setRange(2, 100)
+        self.bins_spin.setValue(10)
+        self.bins_spin.setPrefix("Интервалов: ")
+
+        # Гистограмма строится по одной выбранной группе поля группировки
+        self.group_combo = QComboBox()
+        self.aggregate_combo.currentIndexChanged.connect(self.update_controls)
+        self.by_combo.currentIndexChanged.connect(self.fill_groups)
+
+        run_button = QPushButton("📊 Рассчитать")
+        run_button.clicked.connect(self.run_report)
+
+        controls_layout.addWidget(self.aggregate_combo)
+        controls_layout.addWidget(self.by_combo)
+        controls_layout.addWidget(self.value_combo)
+        controls_layout.addWidget(self.bins_spin)
+        controls_layout.addWidget(self.group_combo)
+        controls_layout.addWidget(run_button)
+        layout.addLayout(controls_layout)
+
+        # Таблица результатов
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table)
+
+        self.timing_label = QLabel()
+        layout.addWidget(self.timing_label)
+
+        self.fill_groups()
+        self.run_report()
+
+    def fill_groups(self):
+        self.group_combo.clear()
+        self.group_combo.addItem("Все группы", None)
+        by = self.by_combo.currentData()
+        if by is not None:
+            for label in sorted(self.analytics.labels[by]):
+                self.group_combo.addItem(label, label)
+        self.update_controls()
+
+    def update_controls(self):
+        hist = self.aggregate_combo.currentData() == 'hist'
+        self.bins_spin.setEnabled(hist)
+        self.group_combo.setEnabled(hist and self.by_combo.currentData() is not None)
+
+    def run_report(self):
+        try:
+            start_time = time.perf_counter()
+            headers, rows = self.analytics.report(
+                self.aggregate_combo.currentData(),
+                by=self.by_combo.currentData(),
+                value=self.value_combo.currentData(),
+                bins=self.bins_spin.value(),
+                group=self.group_combo.currentData() if self.group_combo.isEnabled() else None,
+            )
+            duration = (time.perf_counter() - start_time) * 1000
+        except ValueError as e:
+            self.timing_label.setText(f"⚠️ {str(e)}")
+            return
+
+        self.table.clear()
+        self.table.setColumnCount(len(headers))
+        self.table.setRowCount(len(rows))
+        self.table.setHorizontalHeaderLabels(headers)
+        for row_index, row in enumerate(rows):
+            for column_index, value in enumerate(row):
+                self.table.setItem(row_index, column_index, QTableWidgetItem(str(value)))
+
+        self.timing_label.setText(f"⏱️ Рассчитано за {duration:.1f} мс, строк: {len(rows)}")
+
+class PipelineSignals(QObject):
+    # Доставляет события конвейера из рабочих потоков в GUI-поток
+    result = Signal(str)
+    progress = Signal(int, int)
+    finished = Signal(object)
+    outcome = Signal(object)
+
+class CatalogLoader(QObject):
+    """Загрузка и индексация каталога в фоновом потоке.
+
+    Окно остается отзывчивым: сеть, разбор XML и построение индексов идут
+    в рабочем потоке, а готовый результат приходит сигналом loaded.
+    Сигнал progress несколько раз в секунду сообщает получено/всего байт,
+    скорость, число разобранных offer и оценку оставшегося времени.
+    Длительности фаз дописываются в timings_path для сравнения запусков.
+    """
+
+    status = Signal(str)
+    progress = Signal(object)
+    loaded = Signal(object)
+    failed = Signal(str)
+
+    PROGRESS_INTERVAL = 0.2
+
+    def __init__(self, headers=None, timings_path=None, parent=None):
+        super().__init__(parent)
+        self.headers = headers
+        self.timings_path = Path(timings_path) if timings_path else None
+        self.loading = False
+        self.timings = None
+
+    @staticmethod
+    def format_progress(progress):
+        mb = 1024 * 1024
+        message = f"Каталог: {progress['received'] / mb:.1f}"
+        if progress['total']:
+            message += f" из {progress['total'] / mb:.1f}"
+        message += (f" МБ, {progress['speed'] / mb:.1f} МБ/с, "
+                    f"{progress['offers_per_second']:.0f} товаров/с")
+        if progress['eta'] is not None:
+            message += f", осталось ~{progress['eta']:.0f} с"
+        return message
+
+    def start(self):
+        if self.loading:
+            return
+        self.loading = True
+        threading.Thread(target=self._run, name="catalog-loader", daemon=True).start()
+
+    def _run(self):
+        start_time = time.perf_counter()
+        last_emit = [0.0]
+        counters = {'received': 0, 'offers': 0}
+
+        def on_progress(received, total, offers):
+            counters['received'], counters['offers'] = received, offers
+            now = time.perf_counter()
+            if now - last_emit[0] < self.PROGRESS_INTERVAL and received != total:
+                return
+            last_emit[0] = now
+            elapsed = max(now - start_time, 1e-6)
+            speed = received / elapsed
+            eta = (total - received) / speed if total and speed else None
+            self.progress.emit({'received': received, 'total': total, 'speed': speed,
+                                'offers': offers, 'offers_per_second': offers / elapsed,
+                                'eta': eta})
+
+        try:
+            self.status.emit("Загрузка каталога...")
+            xml_data = fetch_catalog(self.headers, on_progress)
+            index_start = time.perf_counter()
+            download_time = index_start - start_time
+            STARTUP_TRACE.add('catalog.download_parse', start_time, index_start, 'catalog')
+            self.status.emit("Индексация каталога...")
+            catalog_index = CatalogIndex(xml_data)
+            index_end = time.perf_counter()
+            index_time = index_end - index_start
+            STARTUP_TRACE.add('catalog.index', index_start, index_end, 'catalog')
+        except Exception as e:
+            self.loading = False
+            self.failed.emit(str(e))
+            return
+        self.timings = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'bytes': counters['received'],
+            'offers': counters['offers'],
+            'download_parse': round(download_time, 3),
+            'index': round(index_time, 3),
+            'total': round(time.perf_counter() - start_time, 3),
+        }
+        self._save_timings()
+        self.loading = False
+        self.loaded.emit((xml_data, catalog_index))
+
+    def _save_timings(self):
+        if self.timings_path is None:
+            return
+        try:
+            self.timings_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.timings_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(self.timings, ensure_ascii=False) + '\n')
+        except OSError:
+            pass
+
+class ResultsModel(QAbstractTableModel):
+    """Итоги пакета по артикулам для QTableView.
+
+    Строки копятся и вставляются пачками по таймеру, а представление
+    рисует только видимые строки. Сортировка и фильтр выполняются внутри
+    модели над списком номеров строк: sorted с ключом работает в разы
+    быстрее, чем QSortFilterProxyModel, который на каждое сравнение
+    вызывает data() из Python. Так таблица остается плавной и на сотнях
+    тысяч артикулов.
+    """
+
+    COLUMNS = [
+        ('article', 'Артикул'),
+        ('status', 'Статус'),
+        ('images', 'Фото'),
+        ('sizes', 'Размеров'),
+        ('bytes', 'Объём, КБ'),
+        ('duration', 'Время, с'),
+    ]
+    STATUSES = {
+        'ok': '✅ Готово',
+        'partial': '⚠️ Не все фото',
+        'failed': '❌ Фото не скачаны',
+        'error': '❌ Ошибка',
+        'missing': '🚫 Нет в каталоге',
+    }
+    # Эти артикулы есть смысл загрузить повторно
+    RETRY_STATUSES = ('partial', 'failed', 'error')
+    # Больше строк за раз дешевле пересортировать целиком, чем вставлять по одной
+    INSERT_LIMIT = 500
+
+    def __init__(self, parent=None, flush_interval=200):
+        super().__init__(parent)
+        self.rows = []
+        self._visible = []           # номера строк в порядке показа
+        self._keys = []              # ключи сортировки видимых строк, в том же порядке
+        self._sort_column = -1       # -1 - в порядке поступления
+        self._sort_order = Qt.AscendingOrder
+        self._statuses = None
+        self._article_text = ''
+        self._pending = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[self._visible[index.row()]]
+        column = self.COLUMNS[index.column()][0]
+        if role == Qt.DisplayRole:
+            if column == 'status':
+                return self.STATUSES.get(row['status'], row['status'])
+            if column == 'images':
+                return f"{row['images_ok']} / {row['images_total']}"
+            if column == 'bytes':
+                return f"{row['bytes'] / 1024:.0f}"
+            if column == 'duration':
+                return f"{row['duration']:.2f}"
+            return row[column]
+        if role == Qt.TextAlignmentRole and column not in ('article', 'status'):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def _accepts(self, row):
+        if self._statuses is not None and row['status'] not in self._statuses:
+            return False
+        return not self._article_text or self._article_text in row['article'].lower()
+
+    def _sort_key(self):
+        column = self.COLUMNS[self._sort_column][0]
+        rows = self.rows
+        if column == 'images':
+            return lambda i: (rows[i]['images_ok'], rows[i]['images_total'])
+        return lambda i: rows[i][column]
+
+    def _insert_position(self, key):
+        """Место новой строки в отсортированном порядке - после равных ей, как у sorted"""
+        keys = self._keys
+        descending = self._sort_order == Qt.DescendingOrder
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if (keys[middle] < key) if descending else (key < keys[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def _rebuild(self):
+        self.layoutAboutToBeChanged.emit()
+        # Выделение и текущая строка должны остаться на тех же записях
+        persistent = self.persistentIndexList()
+        tracked = [(self._visible[index.row()], index.column()) for index in persistent]
+        visible = [i for i, row in enumerate(self.rows) if self._accepts(row)]
+        if self._sort_column >= 0:
+            sort_key = self._sort_key()
+            keys = [sort_key(i) for i in visible]
+            order = sorted(range(len(visible)), key=keys.__getitem__,
+                           reverse=self._sort_order == Qt.DescendingOrder)
+            visible = [visible[position] for position in order]
+            self._keys = [keys[position] for position in order]
+        else:
+            self._keys = []
+        self._visible = visible
+        positions = {row: position for position, row in enumerate(visible)}
+        self.changePersistentIndexList(persistent, [
+            self.index(positions[row], column) if row in positions else QModelIndex()
+            for row, column in tracked
+        ])
+        self.layoutChanged.emit()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild()
+
+    def set_filter(self, statuses=None, article_text=''):
+        self._statuses = statuses
+        self._article_text = article_text.strip().lower()
+        self._rebuild()
+
+    def add(self, outcome):
+        self._pending.append(outcome)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        first = len(self.rows)
+        self.rows.extend(pending)
+        added = [first + i for i, row in enumerate(pending) if self._accepts(row)]
+        if added and self._sort_column >= 0:
+            if len(added) > self.INSERT_LIMIT:
+                self._rebuild()
+                return
+            # При включенной сортировке новые строки встают на свои места
+            sort_key = self._sort_key()
+            for i in added:
+                key = sort_key(i)
+                position = self._insert_position(key)
+                self.beginInsertRows(QModelIndex(), position, position)
+                self._visible.insert(position, i)
+                self._keys.insert(position, key)
+                self.endInsertRows()
+        elif added:
+            start = len(self._visible)
+            self.beginInsertRows(QModelIndex(), start, start + len(added) - 1)
+            self._visible.extend(added)
+            self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self._visible = []
+        self._keys = []
+        self._pending = []
+        self.endResetModel()
+
+    def retry_articles(self):
+        self.flush()
+        return [row['article'] for row in self.rows if row['status'] in self.RETRY_STATUSES]
 
 class ParserApp(QMainWindow):
-    def __init__(self):
+    # Сколько ждать остановки конвейера при закрытии окна, с
+    PIPELINE_CLOSE_TIMEOUT = 30
+
+    def __init__(self, trace_path=None, trace_format=None, defer_startup=None):
         super().__init__()
         
+        # Трасса запуска: фазы конструктора окна, загрузка каталога и отложенные задачи
+        self.startup_trace = STARTUP_TRACE
+        self.trace_path = trace_path or os.getenv('PARSER_STARTUP_TRACE')
+        self.trace_format = trace_format or os.getenv('PARSER_STARTUP_TRACE_FORMAT', 'chrome')
+        # Некритичную для первого кадра работу (шрифт, дисковый кэш миниатюр) можно
+        # выполнить после показа окна
+        if defer_startup is None:
+            defer_startup = os.getenv('PARSER_DEFER_STARTUP', '0') == '1'
+        self.defer_startup = defer_startup
+        self.startup_ready = False
+        
         # Устанавливаем иконку приложения
-        self.setWindowIcon(QIcon("icon.ico"))
+        self.startup_trace.phase('icon')
+        self.setWindowIcon(QIcon(str(resource_path("icon.ico"))))
         
-        # Устанавливаем шрифты
-        self.font_family = FontManager.setup_fonts() or "Segoe UI"
+        # Устанавливаем шрифты: только локальные файлы, недостающий шрифт докачивается в фоне
+        self.font_downloader = FontDownloader(self)
+        self.font_downloader.loaded.connect(self.on_font_downloaded)
+        self.font_downloader.failed.connect(self.on_font_failed)
+        self.font_family = FontManager.FALLBACK_FAMILY
+        self.font_missing = True
+        if not self.defer_startup:
+            self.startup_trace.phase('fonts')
+            family = FontManager.setup_fonts()
+            if family:
+                self.font_family, self.font_missing = family, False
         
         # Устанавливаем темную тему
+        self.startup_trace.phase('theme')
         self.setup_dark_theme()
         
         # Создаем и показываем сплэш-скрин
+        self.startup_trace.phase('splash')
         self.splash = ModernSplashScreen()
         self.splash.show()
         
         # Инициализируем компоненты
+        self.startup_trace.phase('widgets')
         self.search_input = QLineEdit()
         self.search_button = QPushButton("Найти товар")
         self.article_input = QTextEdit()
         self.article_input.setMinimumHeight(100)
-        self.info_area = QTextEdit()
-        self.info_area.setReadOnly(True)
+        log_file = os.getenv('PARSER_LOG_FILE')
+        self.info_area = LogView(int(os.getenv('PARSER_LOG_LINES', '5000')),
+                                 spill_path=log_file or None)
         self.progress_bar = QProgressBar()
         self.status_label = QLabel()
         
@@ -382,7 +3654,42 @@ class ParserApp(QMainWindow):
             QLineEdit:focus {{
                 border-color: #505050;
             }}
-            QTextEdit {{
+            QComboBox {{
+                padding: 8px;
+                border: 1px solid #404040;
+                border-radius: 4px;
+                background-color: #2C2C2C;
+                color: white;
+                font-size: 14px;
+                font-family: "{self.font_family}";
+            }}
+            QTableView {{
+                background-color: #242424;
+                alternate-background-color: #2A2A2A;
+                color: white;
+                gridline-color: #404040;
+                border: 1px solid #404040;
+                font-size: 13px;
+            }}
+            QHeaderView::section {{
+                background-color: #2C2C2C;
+                color: white;
+                border: 1px solid #404040;
+                padding: 4px;
+            }}
+            QTabWidget::pane {{
+                border: none;
+            }}
+            QTabBar::tab {{
+                background-color: #2C2C2C;
+                color: white;
+                padding: 8px 16px;
+                border-radius: 4px;
+            }}
+            QTabBar::tab:selected {{
+                background-color: #404040;
+            }}
+            QTextEdit, QPlainTextEdit {{
                 background-color: #2C2C2C;
                 color: white;
                 border: 1px solid #404040;
@@ -404,21 +3711,55 @@ class ParserApp(QMainWindow):
         """)
         
         # Заголовки для запросов
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-        }
+        self.headers = dict(DEFAULT_HEADERS)
+        
+        # Общие для всех окон товара загрузчик и кэш миниатюр
+        self.startup_trace.phase('image_loader')
+        self.image_loader = ImageLoader(self.headers, int(os.getenv('PARSER_IMAGE_WORKERS', '4')),
+                                        parent=self)
+        if not self.defer_startup:
+            self.startup_trace.phase('thumbnail_disk_cache')
+            self.image_loader.disk_cache = self.create_thumbnail_disk_cache()
+        thumbnail_cache_mb = float(os.getenv('PARSER_THUMBNAIL_CACHE_MB', '64'))
+        self.thumbnail_cache = ThumbnailCache(int(thumbnail_cache_mb * 1024 * 1024))
         
         # Создаем папку products, если её нет
+        self.startup_trace.phase('services')
         self.products_dir = Path("products")
         self.products_dir.mkdir(exist_ok=True)
+        self.product_layout = ProductLayout.load(self.products_dir)
+        if self.product_layout.warning:
+            self.info_area.append(self.product_layout.warning)
+        self.journal = ProductJournal(self.product_layout)
         
         # Инициализируем XML данные
         self.xml_data = None
+        self.catalog_index = None
+        self.product_cache = ProductCache()
+        # Действия, которые ждут окончания загрузки каталога
+        self.catalog_waiters = []
+        self.catalog_loader = CatalogLoader(
+            self.headers, os.getenv('PARSER_TIMINGS_FILE', '.cache/catalog_timings.jsonl'), self)
+        self.catalog_loader.status.connect(self.on_catalog_status)
+        self.catalog_loader.progress.connect(self.on_catalog_progress)
+        self.catalog_loader.loaded.connect(self.on_catalog_loaded)
+        self.catalog_loader.failed.connect(self.on_catalog_failed)
+        self.analytics = None
+        
+        # Конвейер массовой загрузки (None, если загрузка не идет)
+        self.pipeline = None
+        self.pipeline_signals = PipelineSignals()
+        self.pipeline_signals.result.connect(self.on_batch_result)
+        self.pipeline_signals.finished.connect(self.on_batch_finished)
+        self.pipeline_signals.outcome.connect(self.on_batch_outcome)
+        self.pipeline_signals.progress.connect(self.on_batch_progress)
+        self.mirror_signals = PipelineSignals()
+        self.mirror_signals.result.connect(self.info_area.append)
+        self.mirror_signals.progress.connect(self.on_mirror_progress)
+        self.mirror_signals.finished.connect(self.on_mirror_finished)
         
         # Add search functionality
+        self.startup_trace.phase('ui')
         self.search_input.setPlaceholderText("Введите артикул для поиска")
         self.search_button.clicked.connect(self.search_product)
         
@@ -532,7 +3873,7 @@ class ParserApp(QMainWindow):
                 font-weight: bold;
             }
         """)
-        search_button.clicked.connect(self.process_articles)
+        search_button.clicked.connect(lambda: self.process_articles())
         
         clear_button = QPushButton("🗑️ Очистить")
         clear_button.setStyleSheet("""
@@ -550,12 +3891,111 @@ class ParserApp(QMainWindow):
         """)
         open_folder_button.clicked.connect(self.open_products_folder)
         
+        analytics_button = QPushButton("📊 Аналитика")
+        analytics_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        analytics_button.clicked.connect(self.show_analytics)
+        
+        category_button = QPushButton("🌳 Скачать категорию")
+        category_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        category_button.clicked.connect(self.download_category)
+        
+        model_button = QPushButton("👟 Скачать модели целиком")
+        model_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        model_button.clicked.connect(self.download_model_groups)
+        
+        mirror_button = QPushButton("🔄 Зеркало каталога")
+        mirror_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        mirror_button.clicked.connect(self.sync_mirror)
+        
+        gc_button = QPushButton("🧹 Очистить устаревшие")
+        gc_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        gc_button.clicked.connect(self.collect_stale_products)
+        
+        verify_button = QPushButton("🩺 Проверить файлы")
+        verify_button.setStyleSheet("""
+            QPushButton {
+                padding: 10px 20px;
+            }
+        """)
+        verify_button.clicked.connect(self.verify_last_run)
+        
         # Добавляем кнопки в layout
         button_layout.addWidget(search_button)
         button_layout.addWidget(clear_button)
         button_layout.addWidget(open_folder_button)
         
+        # Второй ряд: действия над всем каталогом
+        catalog_button_layout = QHBoxLayout()
+        catalog_button_layout.setSpacing(10)
+        catalog_button_layout.addWidget(category_button)
+        catalog_button_layout.addWidget(model_button)
+        catalog_button_layout.addWidget(mirror_button)
+        catalog_button_layout.addWidget(gc_button)
+        catalog_button_layout.addWidget(verify_button)
+        catalog_button_layout.addWidget(analytics_button)
+        
+        # Выбор движка загрузки фотографий
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItem("⚙️ Потоки", 'threads')
+        self.engine_combo.addItem("⚙️ asyncio", 'asyncio')
+        if aiohttp is None:
+            self.engine_combo.model().item(1).setEnabled(False)
+        default_engine = self.engine_combo.findData(os.getenv('PARSER_DOWNLOAD_ENGINE', 'threads'))
+        # Недоступный движок из настроек не выбираем - остаются потоки
+        if default_engine < 0 or not self.engine_combo.model().item(default_engine).isEnabled():
+            default_engine = 0
+        self.engine_combo.setCurrentIndex(default_engine)
+        catalog_button_layout.addWidget(self.engine_combo)
+        
+        # Выгрузка всех товаров пакета в один файл
+        self.export_combo = QComboBox()
+        self.export_combo.addItem("🧾 Без выгрузки", None)
+        for key, title in ProductExporter.FORMATS.items():
+            self.export_combo.addItem(f"🧾 {title}", key)
+        default_export = self.export_combo.findData(os.getenv('PARSER_EXPORT_FORMAT'))
+        self.export_combo.setCurrentIndex(max(0, default_export))
+        catalog_button_layout.addWidget(self.export_combo)
+        
+        # Постоянная база товаров products/.products.db
+        self.store_combo = QComboBox()
+        self.store_combo.addItem("🗄 Без базы", None)
+        self.store_combo.addItem("🗄 База: пути к фото", 'paths')
+        self.store_combo.addItem("🗄 База: фото внутри", 'blobs')
+        default_store = self.store_combo.findData(os.getenv('PARSER_PRODUCT_STORE'))
+        self.store_combo.setCurrentIndex(max(0, default_store))
+        catalog_button_layout.addWidget(self.store_combo)
+        
+        # Куда складывать файлы пакета: в папку products или сразу в архив
+        self.output_combo = QComboBox()
+        self.output_combo.addItem("📁 В папку", None)
+        for key, title in ArchiveWriter.FORMATS.items():
+            self.output_combo.addItem(f"📦 Архив {title}", key)
+        default_output = self.output_combo.findData(os.getenv('PARSER_ARCHIVE_FORMAT'))
+        self.output_combo.setCurrentIndex(max(0, default_output))
+        catalog_button_layout.addWidget(self.output_combo)
+        
         bulk_layout.addLayout(button_layout)
+        bulk_layout.addLayout(catalog_button_layout)
         main_layout.addWidget(bulk_frame)
         
         # Прогресс бар
@@ -600,7 +4040,47 @@ class ParserApp(QMainWindow):
         info_layout.addWidget(info_title)
         
         self.info_area.setMinimumHeight(200)
-        info_layout.addWidget(self.info_area)
+        
+        # Таблица итогов пакета по артикулам
+        results_widget = QWidget()
+        results_layout = QVBoxLayout(results_widget)
+        results_layout.setContentsMargins(0, 10, 0, 0)
+        results_filter_layout = QHBoxLayout()
+        self.results_status_combo = QComboBox()
+        self.results_status_combo.addItem("Все статусы", None)
+        self.results_status_combo.addItem("Требуют повтора", ResultsModel.RETRY_STATUSES)
+        for key, title in ResultsModel.STATUSES.items():
+            self.results_status_combo.addItem(title, (key,))
+        self.results_status_combo.currentIndexChanged.connect(self.filter_results)
+        self.results_search = QLineEdit()
+        self.results_search.setPlaceholderText("Фильтр по артикулу")
+        self.results_search.textChanged.connect(self.filter_results)
+        retry_button = QPushButton("🔁 Повторить неудачные")
+        retry_button.clicked.connect(self.retry_failed)
+        results_filter_layout.addWidget(self.results_status_combo)
+        results_filter_layout.addWidget(self.results_search)
+        results_filter_layout.addWidget(retry_button)
+        results_layout.addLayout(results_filter_layout)
+        
+        self.results_model = ResultsModel(self)
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results_model)
+        # Пока пользователь не выбрал колонку, строки идут в порядке поступления
+        self.results_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.results_view.setSortingEnabled(True)
+        self.results_view.setSelectionBehavior(QTableView.SelectRows)
+        self.results_view.setAlternatingRowColors(True)
+        self.results_view.verticalHeader().setVisible(False)
+        # Фиксированная высота строк: представлению не нужно измерять каждую строку
+        self.results_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.results_view.verticalHeader().setDefaultSectionSize(24)
+        self.results_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        results_layout.addWidget(self.results_view)
+        
+        self.info_tabs = QTabWidget()
+        self.info_tabs.addTab(self.info_area, "Журнал")
+        self.info_tabs.addTab(results_widget, "Результаты")
+        info_layout.addWidget(self.info_tabs)
         
         main_layout.addWidget(info_frame)
         
@@ -625,8 +4105,91 @@ class ParserApp(QMainWindow):
         # Initialize animations
         self.button_animations = {}
         
-        # Загружаем XML данные через таймер
-        QTimer.singleShot(1000, self.initialize_app)
+        # Каталог грузится в фоне, окно доступно сразу
+        self.startup_trace.phase('catalog_start')
+        self.load_catalog()
+        self.startup_trace.phase(None)
+        # Первый проход цикла событий после show - окно отрисовано и принимает ввод
+        QTimer.singleShot(0, self.on_startup_interactive)
+
+    @staticmethod
+    def create_thumbnail_disk_cache():
+        return ThumbnailDiskCache(
+            Path(os.getenv('PARSER_THUMBNAIL_DIR', '.cache/thumbnails')),
+            int(float(os.getenv('PARSER_THUMBNAIL_DISK_MB', '256')) * 1024 * 1024),
+        )
+
+    def on_startup_interactive(self):
+        elapsed = self.startup_trace.mark('interactive')
+        if self.trace_path:
+            self.info_area.append(
+                f"⏱ Окно готово к вводу через {elapsed * 1000:.0f} мс после старта")
+        if self.defer_startup:
+            # Отложенные задачи - по одной на проход цикла событий, чтобы не задерживать ввод
+            QTimer.singleShot(0, self.run_deferred_fonts)
+            QTimer.singleShot(0, self.run_deferred_thumbnail_cache)
+        else:
+            self.download_missing_font()
+
+    def download_missing_font(self):
+        """Докачивает шрифт в фоне, если его нет локально; окно работает с системным шрифтом"""
+        if self.font_missing and os.getenv('PARSER_FONT_DOWNLOAD', '1') != '0':
+            self.font_downloader.start()
+
+    def on_font_downloaded(self, path):
+        family = FontManager.register(path)
+        if not family:
+            # Испорченный файл не должен находиться при следующем запуске
+            Path(path).unlink(missing_ok=True)
+            self.on_font_failed(f"файл {path} не распознан как шрифт")
+            return
+        self.font_missing = False
+        self.apply_font_family(family)
+        self.info_area.append(f"🔤 Шрифт {family} загружен и применен")
+
+    def on_font_failed(self, error):
+        self.info_area.append(f"⚠️ Шрифт не загружен, используется системный: {error}")
+
+    def run_deferred_fonts(self):
+        with self.startup_trace.span('fonts', 'deferred'):
+            family = FontManager.setup_fonts()
+            if family:
+                self.font_missing = False
+                self.apply_font_family(family)
+        self.download_missing_font()
+
+    def run_deferred_thumbnail_cache(self):
+        with self.startup_trace.span('thumbnail_disk_cache', 'deferred'):
+            self.image_loader.disk_cache = self.create_thumbnail_disk_cache()
+
+    def apply_font_family(self, family):
+        """Подменяет семейство шрифта в уже построенных стилях окна и приложения"""
+        if family == self.font_family:
+            return
+        old, new = f'"{self.font_family}"', f'"{family}"'
+        windows = [self, self.splash]
+        widgets = windows + [child for window in windows for child in window.findChildren(QWidget)]
+        for widget in widgets:
+            style = widget.styleSheet()
+            if old in style:
+                widget.setStyleSheet(style.replace(old, new))
+        self.font_family = family
+        QApplication.setFont(QFont(family, 9))
+
+    def finish_startup_trace(self):
+        """Отметка готовности (окно и каталог) и экспорт трассы запуска"""
+        if self.startup_ready:
+            return
+        self.startup_ready = True
+        elapsed = self.startup_trace.mark('ready')
+        if not self.trace_path:
+            return
+        self.info_area.append(f"⏱ Приложение готово через {elapsed:.2f} с после старта")
+        try:
+            self.startup_trace.export(self.trace_path, self.trace_format)
+            self.info_area.append(f"⏱ Трасса запуска сохранена: {self.trace_path}")
+        except (OSError, ValueError) as e:
+            self.info_area.append(f"❌ Не удалось сохранить трассу запуска: {e}")
 
     def setup_dark_theme(self):
         # Устанавливаем темную тему для всего приложения
@@ -663,148 +4226,424 @@ class ParserApp(QMainWindow):
         """)
         self.status_label.setText(message)
         
-    def initialize_app(self):
-        try:
-            self.splash.showMessage("Загрузка каталога...", 
-                                  Qt.AlignCenter | Qt.AlignBottom, Qt.white)
-            QApplication.processEvents()
-            
-            self.load_xml_data()
-            self.splash.finish(self)
-            self.update_status("✅ Приложение готово к работе")
-        except Exception as e:
-            self.splash.finish(self)
-            self.update_status(f"❌ Ошибка инициализации: {str(e)}", True)
-        
     def clear_all(self):
         self.article_input.clear()
         self.info_area.clear()
         self.progress_bar.setVisible(False)
         self.update_status("🗑️ Все поля очищены")
             
-    def load_xml_data(self):
-        try:
-            self.info_area.append("🔄 Загрузка каталога...")
-            QApplication.processEvents()
-            
-            response = requests.get('https://outmaxshop.com/yml/all_new.yml', headers=self.headers)
-            response.raise_for_status()
-            self.xml_data = ET.fromstring(response.content)
-            
-            self.info_area.append("✅ Каталог успешно загружен")
-        except Exception as e:
-            error_msg = f"❌ Ошибка загрузки каталога: {str(e)}"
-            self.info_area.append(error_msg)
-            self.update_status(error_msg, True)
-            raise
-            
-    def download_image(self, url, path):
-        try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            with open(path, 'wb') as f:
-                f.write(response.content)
+    def load_catalog(self):
+        """Запускает фоновую загрузку каталога"""
+        if self.catalog_loader.loading:
+            return
+        self.info_area.append("🔄 Загрузка каталога...")
+        self.update_status("⏳ Загрузка каталога...")
+        self.catalog_loader.start()
+
+    def require_catalog(self, action):
+        """True, если каталог готов; иначе action выполнится сразу после его загрузки"""
+        if self.catalog_index is not None:
             return True
-        except Exception:
-            return False
-            
-    def process_product(self, article):
-        try:
-            # Ищем товар
-            product = None
-            for offer in self.xml_data.findall('.//offer'):
-                if offer.get('id') == article:
-                    product = offer
-                    break
-                    
-            if product is None:
-                return f"❌ Артикул {article}: товар не найден"
-                
-            # Получаем информацию о товаре
-            name = product.find('name').text if product.find('name') is not None else "Нет названия"
-            
-            # Создаем директорию для товара
-            product_dir = self.products_dir / article
-            product_dir.mkdir(exist_ok=True)
-            
-            # Собираем информацию о размерах
-            sizes_info = []
-            for param in product.findall('.//param'):
-                if param.get('name') == 'Размер':
-                    size = param.text
-                    sizes_info.append(f'"{size}"')
-            
-            # Сохраняем информацию в файл
-            with open(product_dir / f"{article}_info.txt", "w", encoding="utf-8") as f:
-                f.write(f"Артикул: {article}\n")
-                f.write(f"Название: {name}\n\n")
-                f.write("Размеры:\n")
-                for size in sizes_info:
-                    f.write(f"{size}\n")
-            
-            # Загружаем изображения
-            pictures = product.findall('.//picture')
-            successful_downloads = 0
-            
-            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-                future_to_url = {}
-                for i, picture in enumerate(pictures, 1):
-                    image_url = picture.text
-                    # Возвращаем предыдущий формат названия с полным именем товара
-                    safe_name = name.replace('/', '_').replace('\\', '_').replace(':', '_').replace('*', '_').replace('?', '_').replace('"', '_').replace('<', '_').replace('>', '_').replace('|', '_')
-                    image_name = f"{article}_{safe_name}_{i}.jpg"
-                    image_path = product_dir / image_name
-                    
-                    future = executor.submit(self.download_image, image_url, image_path)
-                    future_to_url[future] = image_url
-                
-                for future in concurrent.futures.as_completed(future_to_url):
-                    if future.result():
-                        successful_downloads += 1
-            
-            return f"✅ Артикул {article}: загружено {successful_downloads} из {len(pictures)} изображений, найдено {len(sizes_info)} размеров"
-            
-        except Exception as e:
-            return f"❌ Артикул {article}: ошибка обработки - {str(e)}"
+        self.catalog_waiters.append(action)
+        self.update_status("⏳ Каталог еще загружается - действие выполнится после загрузки")
+        self.load_catalog()
+        return False
+
+    def on_catalog_status(self, message):
+        self.splash.showMessage(message, Qt.AlignCenter | Qt.AlignBottom, Qt.white)
+
+    def on_catalog_progress(self, progress):
+        message = CatalogLoader.format_progress(progress)
+        if progress['total']:
+            self.splash.set_progress(progress['received'], progress['total'])
+        self.splash.showMessage(message, Qt.AlignCenter | Qt.AlignBottom, Qt.white)
+        self.update_status(f"⏳ {message}")
+
+    def on_catalog_loaded(self, result):
+        with self.startup_trace.span('catalog.apply', 'catalog'):
+            self.xml_data, self.catalog_index = result
+            self.product_cache.reset(self.catalog_index)
+            self.analytics = None
+            self.splash.finish(self)
+        timings = self.catalog_loader.timings
+        self.info_area.append(
+            f"✅ Каталог успешно загружен: {timings['offers']} товаров, "
+            f"{timings['bytes'] / 1048576:.1f} МБ - "
+            f"загрузка и разбор {timings['download_parse']:.1f} с, "
+            f"индексация {timings['index']:.1f} с"
+        )
+        self.update_status("✅ Приложение готово к работе")
+        waiters, self.catalog_waiters = self.catalog_waiters, []
+        for action in waiters:
+            action()
+        self.finish_startup_trace()
+
+    def on_catalog_failed(self, error):
+        self.splash.finish(self)
+        error_msg = f"❌ Ошибка загрузки каталога: {error}"
+        self.info_area.append(error_msg)
+        self.update_status(error_msg, True)
+        self.finish_startup_trace()
+        # Отложенные действия без каталога выполнить нельзя; следующее действие повторит загрузку
+        self.catalog_waiters = []
             
-    def process_articles(self):
-        if self.xml_data is None:
-            self.load_xml_data()
-            if self.xml_data is None:
-                self.update_status("❌ Ошибка: не удалось загрузить каталог", True)
-                return
-                
-        # Получаем список артикулов
-        articles = [art.strip() for art in self.article_input.toPlainText().split('\n') if art.strip()]
+    def process_articles(self, articles=None):
+        if self.pipeline is not None:
+            self.update_status("⚠️ Дождитесь завершения текущей загрузки", True)
+            return
+        
+        # Получаем список артикулов из поля ввода, если он не передан явно
+        if articles is None:
+            articles = [art.strip() for art in self.article_input.toPlainText().split('\n')
+                        if art.strip()]
         
         if not articles:
             self.update_status("⚠️ Введите артикулы товаров", True)
             return
+        
+        if not self.require_catalog(lambda: self.process_articles(articles)):
+            return
             
         self.info_area.clear()
+        self.results_model.clear()
+        
+        # Проверяем весь список по индексу до начала загрузки
+        articles, missing, duplicates = self.product_cache.validate(articles)
+        if missing:
+            self.info_area.append(f"❌ Не найдено в каталоге ({len(missing)}): {', '.join(missing)}")
+            for article in missing:
+                self.results_model.add({'article': article, 'status': 'missing', 'images_ok': 0,
+                                        'images_total': 0, 'sizes': 0, 'bytes': 0, 'duration': 0.0})
+        if duplicates:
+            self.info_area.append(f"⚠️ Повторяются в списке ({len(duplicates)}): "
+                                  f"{', '.join(dict.fromkeys(duplicates))}")
+        if not articles:
+            self.update_status("❌ Ни одного артикула из списка нет в каталоге", True)
+            return
+        
         self.progress_bar.setVisible(True)
         self.progress_bar.setMaximum(len(articles))
         self.progress_bar.setValue(0)
         
-        start_time = time.time()
+        self.batch_start_time = time.time()
+        self.batch_total = len(articles)
+        self.batch_skipped = (len(missing), len(duplicates))
         self.info_area.append(f"🚀 Начало обработки {len(articles)} артикулов...")
         self.update_status("⏳ Идет обработка товаров...")
-        QApplication.processEvents()
         
-        for i, article in enumerate(articles, 1):
-            result = self.process_product(article)
-            self.info_area.append(result)
-            self.progress_bar.setValue(i)
-            QApplication.processEvents()
-        
-        end_time = time.time()
-        duration = end_time - start_time
+        # Конвейер работает в фоновых потоках, результаты приходят через сигналы
+        sinks = []
+        self.batch_archive = None
+        try:
+            downloader = create_downloader(self.engine_combo.currentData(), self.headers)
+            self.batch_exporter = None
+            if self.export_combo.currentData():
+                self.batch_exporter = ProductExporter.for_batch(self.export_combo.currentData())
+                sinks.append(self.batch_exporter)
+            self.run_manifest = None
+            if not self.output_combo.currentData():
+                # Манифест запуска: что скачано, куда и с каким хэшем
+                self.run_manifest = RunManifest.for_run(self.product_layout)
+                sinks.append(self.run_manifest)
+            self.product_store = None
+            if self.store_combo.currentData():
+                self.product_store = ProductStore.open(self.product_layout,
+                                                       self.store_combo.currentData())
+                sinks.append(self.product_store)
+            if self.output_combo.currentData():
+                split_bytes = int(float(os.getenv('PARSER_ARCHIVE_SPLIT_MB', '0')) * 1024 * 1024)
+                self.batch_archive = ArchiveWriter.for_batch(self.output_combo.currentData(),
+                                                             self.product_layout.products_dir,
+                                                             split_bytes)
+            write_info_files = os.getenv('PARSER_INFO_FILES', '1') != '0'
+            self.pipeline = BatchPipeline(self.product_cache, self.product_layout, downloader,
+                                          journal=self.journal, sinks=sinks,
+                                          write_info_files=write_info_files,
+                                          archive=self.batch_archive)
+            self.pipeline.start(articles, self.pipeline_signals.result.emit,
+                                self.pipeline_signals.finished.emit,
+                                self.pipeline_signals.outcome.emit,
+                                self.pipeline_signals.progress.emit)
+        except Exception as e:
+            self.abort_batch(sinks)
+            self.update_status(f"❌ Ошибка запуска загрузки: {str(e)}", True)
+            return
+
+    def abort_batch(self, sinks):
+        """Освобождает конвейер, который не удалось запустить, и закрывает открытые приемники"""
+        if self.pipeline is not None:
+            # Потоки конвейера и загрузчик должны остановиться раньше, чем закроются приемники
+            self.pipeline.cancel()
+            self.pipeline.join()
+            self.pipeline = None
+        if self.batch_archive is not None:
+            sinks = sinks + [self.batch_archive]
+        for sink in sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.info_area.append(f"❌ Ошибка закрытия выгрузки: {str(e)}")
+        self.progress_bar.setVisible(False)
+
+    def on_batch_outcome(self, outcome):
+        self.results_model.add(outcome)
+
+    def filter_results(self):
+        self.results_model.set_filter(self.results_status_combo.currentData(),
+                                      self.results_search.text())
+
+    def retry_failed(self):
+        """Запускает повторную загрузку артикулов, у которых что-то не скачалось"""
+        articles = self.results_model.retry_articles()
+        if not articles:
+            self.update_status("✅ Неудачных артикулов нет")
+            return
+        self.process_articles(articles)
+
+    def on_batch_result(self, message):
+        self.info_area.append(message)
+
+    def on_batch_progress(self, done, total):
+        self.progress_bar.setValue(done)
+
+    def on_batch_finished(self, stats):
+        self.pipeline = None
+        duration = time.time() - self.batch_start_time
+        missing, duplicates = self.batch_skipped
         
         self.info_area.append(f"\n✨ Обработка завершена за {duration:.1f} секунд")
-        self.info_area.append(f"📊 Обработано артикулов: {len(articles)}")
+        self.info_area.append(f"📊 Обработано артикулов: {self.batch_total}")
+        if missing or duplicates:
+            self.info_area.append(f"⏭️ Пропущено: не найдено {missing}, повторов {duplicates}")
+        # Сеть и диск показываем раздельно, чтобы видеть узкое место
+        if stats['fetch_count']:
+            fetch_latency = stats['fetch_latency'] / (stats['fetch_count'] + stats['fetch_errors'])
+            self.info_area.append(
+                f"🌐 Сеть ({stats['engine']}): {stats['fetch_count']} файлов, "
+                f"{stats['fetch_bytes'] / 1048576:.1f} МБ, средняя задержка "
+                f"{fetch_latency * 1000:.0f} мс"
+            )
+        if stats['write_count']:
+            self.info_area.append(
+                f"💾 Диск: {stats['write_count']} файлов, средняя задержка записи "
+                f"{stats['write_latency'] / stats['write_count'] * 1000:.1f} мс, "
+                f"максимальная {stats['write_max_latency'] * 1000:.1f} мс"
+            )
+        if self.batch_exporter is not None:
+            self.info_area.append(f"🧾 Выгрузка: {self.batch_exporter.path.absolute()} "
+                                  f"({self.batch_exporter.count} товаров)")
+        if self.batch_archive is not None:
+            parts = ', '.join(path.name for path in self.batch_archive.parts)
+            archive_dir = self.batch_archive.base_path.parent.absolute()
+            self.info_area.append(f"📦 Архив: {archive_dir} - {parts} "
+                                  f"({len(self.batch_archive.entries)} файлов)")
+        if self.run_manifest is not None:
+            self.info_area.append(f"🧾 Манифест запуска: {self.run_manifest.path.absolute()}")
+        if self.product_store is not None:
+            self.info_area.append(f"🗄 База товаров: {self.product_store.path.absolute()} "
+                                  f"({self.product_store.count} товаров)")
         self.info_area.append(f"📁 Папка с товарами: {self.products_dir.absolute()}")
         self.update_status("✅ Обработка завершена")
 
+    def download_category(self):
+        """Скачивает все товары выбранной ветки дерева категорий"""
+        if not self.require_catalog(self.download_category):
+            return
+        
+        choices = self.catalog_index.category_choices()
+        if not choices:
+            QMessageBox.warning(self, "Ошибка", "В каталоге нет дерева категорий")
+            return
+        
+        labels = [label for _, label in choices]
+        label, ok = QInputDialog.getItem(self, "Скачать категорию", "Ветка каталога:",
+                                         labels, 0, False)
+        if not ok:
+            return
+        
+        category_id = choices[labels.index(label)][0]
+        articles = self.catalog_index.select_category(category_id)
+        if not articles:
+            category_path = self.catalog_index.category_path(category_id)
+            self.update_status(f"⚠️ В категории «{category_path}» нет товаров", True)
+            return
+        
+        self.process_articles(articles)
+
+    def download_model_groups(self):
+        """Скачивает все расцветки моделей для введённых артикулов"""
+        articles = [art.strip() for art in self.article_input.toPlainText().split('\n')
+                    if art.strip()]
+        if not articles:
+            self.update_status("⚠️ Введите артикулы товаров", True)
+            return
+        
+        if not self.require_catalog(self.download_model_groups):
+            return
+        
+        self.process_articles(self.catalog_index.expand_model_groups(articles))
+
+    def sync_mirror(self):
+        """Синхронизирует фотографии всего каталога с папкой products"""
+        if self.pipeline is not None:
+            self.update_status("⚠️ Дождитесь завершения текущей загрузки", True)
+            return
+        if not self.require_catalog(self.sync_mirror):
+            return
+        try:
+            downloader = create_downloader(self.engine_combo.currentData(), self.headers)
+        except Exception as e:
+            self.update_status(f"❌ Ошибка запуска зеркала: {str(e)}", True)
+            return
+        
+        # Зеркало занимает место конвейера, чтобы не писать в products параллельно
+        self.pipeline = CatalogMirror(self.catalog_index, self.product_cache, self.product_layout,
+                                      downloader, journal=self.journal)
+        self.info_area.clear()
+        self.info_area.append(
+            f"🔄 Синхронизация зеркала: {len(self.catalog_index.offers)} товаров в каталоге...")
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.update_status("⏳ Идет синхронизация зеркала...")
+        threading.Thread(target=self._run_mirror, args=(self.pipeline,), daemon=True).start()
+
+    def _run_mirror(self, mirror):
+        try:
+            stats = mirror.sync(self.mirror_signals.progress.emit)
+        except Exception as e:
+            self.mirror_signals.result.emit(f"❌ Ошибка синхронизации зеркала: {str(e)}")
+            stats = None
+        self.mirror_signals.finished.emit(stats)
+
+    def on_mirror_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+    def on_mirror_finished(self, stats):
+        self.pipeline = None
+        if stats is None:
+            self.update_status("❌ Синхронизация зеркала не завершена", True)
+            return
+        self.info_area.append(CatalogMirror.format_stats(stats))
+        self.update_status("✅ Зеркало синхронизировано")
+
+    def collect_stale_products(self):
+        """Убирает папки товаров, которых больше нет в каталоге"""
+        if self.pipeline is not None:
+            self.update_status("⚠️ Дождитесь завершения текущей загрузки", True)
+            return
+        if not self.require_catalog(self.collect_stale_products):
+            return
+        try:
+            collector = ProductGarbageCollector(self.catalog_index, self.journal,
+                                                self.product_layout)
+            dry_run = collector.collect('dry-run')
+        except Exception as e:
+            self.update_status(f"❌ Ошибка очистки: {str(e)}", True)
+            return
+        
+        self.info_area.append(ProductGarbageCollector.format_stats(dry_run))
+        if not dry_run['stale']:
+            self.update_status("✅ Устаревших папок нет")
+            return
+        
+        # Сначала показываем, что будет убрано, и спрашиваем режим
+        dialog = QMessageBox(self)
+        dialog.setWindowTitle("Очистка устаревших папок")
+        dialog.setText(f"Товаров нет в каталоге: {dry_run['stale']}.\nЧто сделать с их папками?")
+        modes = ProductGarbageCollector.MODES
+        archive_button = dialog.addButton(modes['archive'], QMessageBox.AcceptRole)
+        delete_button = dialog.addButton(modes['delete'], QMessageBox.DestructiveRole)
+        dialog.addButton("Отмена", QMessageBox.RejectRole)
+        dialog.exec()
+        if dialog.clickedButton() is archive_button:
+            mode = 'archive'
+        elif dialog.clickedButton() is delete_button:
+            mode = 'delete'
+        else:
+            return
+        
+        self.gc_signals = PipelineSignals()
+        self.gc_signals.progress.connect(self.on_mirror_progress)
+        self.gc_signals.finished.connect(self.on_gc_finished)
+        self.pipeline = collector
+        self.progress_bar.setVisible(True)
+        self.update_status("⏳ Идет очистка устаревших папок...")
+        threading.Thread(target=self._run_gc, args=(collector, mode), daemon=True).start()
+
+    def _run_gc(self, collector, mode):
+        try:
+            stats = collector.collect(mode, self.gc_signals.progress.emit)
+        except Exception as e:
+            stats = e
+        self.gc_signals.finished.emit(stats)
+
+    def on_gc_finished(self, stats):
+        self.pipeline = None
+        if isinstance(stats, Exception):
+            self.update_status(f"❌ Ошибка очистки: {str(stats)}", True)
+            return
+        self.info_area.append(ProductGarbageCollector.format_stats(stats))
+        self.update_status("✅ Очистка завершена")
+
+    def verify_last_run(self):
+        """Проверяет файлы последнего запуска по манифесту и докачивает испорченные"""
+        if self.pipeline is not None:
+            self.update_status("⚠️ Дождитесь завершения текущей загрузки", True)
+            return
+        if not self.require_catalog(self.verify_last_run):
+            return
+        manifest_path = RunManifest.latest(self.product_layout)
+        if manifest_path is None:
+            self.update_status("⚠️ Манифестов запусков пока нет", True)
+            return
+        try:
+            verifier = ManifestVerifier(manifest_path, self.product_layout, self.catalog_index,
+                                        self.journal)
+            downloader = create_downloader(self.engine_combo.currentData(), self.headers)
+        except Exception as e:
+            self.update_status(f"❌ Ошибка проверки: {str(e)}", True)
+            return
+        
+        self.verify_signals = PipelineSignals()
+        self.verify_signals.progress.connect(self.on_mirror_progress)
+        self.verify_signals.finished.connect(self.on_verify_finished)
+        self.pipeline = verifier
+        self.progress_bar.setVisible(True)
+        self.info_area.append(f"🩺 Проверка по манифесту {manifest_path.name}...")
+        self.update_status("⏳ Идет проверка файлов...")
+        threading.Thread(target=self._run_verify, args=(verifier, downloader), daemon=True).start()
+
+    def _run_verify(self, verifier, downloader):
+        try:
+            stats = verifier.verify(self.verify_signals.progress.emit)
+            if stats['bad']:
+                verifier.repair(stats, downloader, self.verify_signals.progress.emit)
+        except Exception as e:
+            stats = e
+        self.verify_signals.finished.emit(stats)
+
+    def on_verify_finished(self, stats):
+        self.pipeline = None
+        if isinstance(stats, Exception):
+            self.update_status(f"❌ Ошибка проверки: {str(stats)}", True)
+            return
+        self.info_area.append(ManifestVerifier.format_stats(stats))
+        self.update_status("✅ Проверка завершена")
+
+    def closeEvent(self, event):
+        # Останавливаем фоновую загрузку вместе с окном
+        if self.pipeline is not None and hasattr(self.pipeline, 'cancel'):
+            self.pipeline.cancel()
+            # Потоки конвейера - демоны: без ожидания выгрузка, база и манифест запуска
+            # остались бы недописанными
+            if isinstance(self.pipeline, BatchPipeline):
+                self.update_status("⏳ Завершение загрузки...")
+                self.pipeline.join(self.PIPELINE_CLOSE_TIMEOUT)
+        self.image_loader.shutdown()
+        self.info_area.close_spill()
+        super().closeEvent(event)
+
     def open_products_folder(self):
         """Открывает папку с товарами в проводнике Windows"""
         try:
@@ -837,33 +4676,33 @@ class ParserApp(QMainWindow):
         animation.start()
 
     def show_message(self, message, error=False):
+        # Подсветка идет через строку статуса: перекраска журнала на каждое сообщение
+        # заставляла бы Qt заново применять стили ко всему документу
         self.info_area.append(message)
-        
-        # Анимация появления сообщения
-        cursor = self.info_area.textCursor()
-        cursor.movePosition(cursor.End)
-        self.info_area.setTextCursor(cursor)
-        
-        # Кратковременная подсветка области информации
-        original_style = self.info_area.styleSheet()
-        flash_color = "#3A2A2A" if error else "#2A3A2A"
-        self.info_area.setStyleSheet(f"""
-            QTextEdit {{
-                background-color: {flash_color};
-                color: white;
-                border: 1px solid #404040;
-                border-radius: 4px;
-                padding: 8px;
-                font-size: 14px;
-            }}
-        """)
-        QTimer.singleShot(200, lambda: self.info_area.setStyleSheet(original_style))
+        self.update_status(message, error)
+
+    def get_analytics(self):
+        # Колоночное представление строится один раз на загруженный каталог
+        if self.analytics is None:
+            self.analytics = CatalogAnalytics.from_xml(self.xml_data)
+        return self.analytics
+
+    def show_analytics(self):
+        if not self.require_catalog(self.show_analytics):
+            return
+        try:
+            analytics_window = AnalyticsWindow(self.get_analytics(), self)
+            analytics_window.show()
+        except Exception as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось построить аналитику: {str(e)}")
 
     def search_product(self):
         article = self.search_input.text().strip()
         if not article:
             QMessageBox.warning(self, "Ошибка", "Введите артикул товара")
             return
+        if not self.require_catalog(self.search_product):
+            return
         
         try:
             # Find product in XML data
@@ -879,26 +4718,19 @@ class ParserApp(QMainWindow):
     
     def find_product_by_article(self, article):
         try:
-            # Проверяем, загружены ли XML данные
-            if self.xml_data is None:
-                self.load_xml_data()
-                if self.xml_data is None:
-                    raise Exception("Не удалось загрузить каталог")
-
-            # Ищем товар в XML
-            product = None
-            for offer in self.xml_data.findall('.//offer'):
-                if offer.get('id') == article:
-                    product = offer
-                    break
+            # Каталог загружается в фоне; вызывающий код ждет его через require_catalog
+            if self.catalog_index is None:
+                raise Exception("Каталог еще не загружен")
 
+            # Берем готовое представление товара из общего кэша
+            product = self.product_cache.get(article)
             if product is None:
                 return None
 
             # Получаем основную информацию о товаре
-            name = product.find('name').text if product.find('name') is not None else "Нет данных"
-            price = product.find('price').text if product.find('price') is not None else "Нет данных"
-            oldprice = product.find('oldprice').text if product.find('oldprice') is not None else "Нет данных"
+            name = product['name'] if product['name'] is not None else "Нет данных"
+            price = product['price'] if product['price'] is not None else "Нет данных"
+            oldprice = product['oldprice'] if product['oldprice'] is not None else "Нет данных"
             
             # Собираем информацию из параметров
             params = {
@@ -912,22 +4744,12 @@ class ParserApp(QMainWindow):
                 'Пол': 'Нет данных'
             }
             
-            for param in product.findall('.//param'):
-                param_name = param.get('name')
-                if param_name in params:
-                    params[param_name] = param.text
-
-            # Собираем информацию о размерах
-            sizes = []
-            for param in product.findall('.//param'):
-                if param.get('name') == 'Размер':
-                    sizes.append(param.text)
-
-            # Собираем URL фотографий
-            images = []
-            for picture in product.findall('.//picture'):
-                if picture.text:
-                    images.append(picture.text)
+            for param_name in params:
+                if param_name in product['params']:
+                    params[param_name] = product['params'][param_name]
+
+            sizes = product['sizes']
+            images = list(product['images'])
 
             # Формируем словарь с информацией о товаре
             product_data = {
@@ -952,8 +4774,210 @@ class ParserApp(QMainWindow):
         except Exception as e:
             raise Exception(f"Ошибка при поиске товара: {str(e)}")
 
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='PARSER MAX 2',
+        description='Без аргументов запускается графический интерфейс'
+    )
+    parser.add_argument('--trace', metavar='PATH',
+                        help='Сохранить трассу запуска интерфейса в файл')
+    parser.add_argument('--trace-format', choices=StartupTrace.FORMATS,
+                        help='Формат трассы: chrome (chrome://tracing, Perfetto) или json')
+    parser.add_argument('--defer-noncritical', action='store_true',
+                        help='Загружать шрифт и дисковый кэш миниатюр после показа окна')
+    subparsers = parser.add_subparsers(dest='command')
+
+    stats_parser = subparsers.add_parser('stats', help='Аналитика по всему каталогу')
+    stats_parser.add_argument('aggregate', choices=list(CatalogAnalytics.AGGREGATES))
+    stats_parser.add_argument('--by', choices=CatalogAnalytics.GROUP_FIELDS,
+                              help='Поле группировки')
+    stats_parser.add_argument('--value', choices=list(CatalogAnalytics.VALUE_FIELDS),
+                              default='price', help='Числовое поле')
+    stats_parser.add_argument('--bins', type=int, default=10, help='Число интервалов гистограммы')
+    stats_parser.add_argument('--group', help='Группа для гистограммы (вместе с --by)')
+
+    bench_parser = subparsers.add_parser('bench', help='Сравнение движков загрузки фотографий')
+    bench_parser.add_argument('--engine', nargs='+', choices=list(DOWNLOAD_ENGINES),
+                              default=list(DOWNLOAD_ENGINES), help='Движки для сравнения')
+    bench_parser.add_argument('--limit', type=int, default=500, help='Число фотографий')
+    bench_parser.add_argument('--concurrency', type=int, help='Параллельность загрузки')
+
+    mirror_parser = subparsers.add_parser('mirror', help='Синхронизация фотографий всего каталога')
+    mirror_parser.add_argument('--engine', choices=list(DOWNLOAD_ENGINES), help='Движок загрузки')
+    mirror_parser.add_argument('--revalidate', action='store_true',
+                               help='Проверять на сервере уже скачанные фотографии '
+                                    '(ETag/Last-Modified)')
+    mirror_parser.add_argument('--no-prune', action='store_true',
+                               help='Не удалять фотографии товаров, ушедших из каталога')
+
+    gc_parser = subparsers.add_parser('gc', help='Очистка папок товаров, которых нет в каталоге')
+    gc_parser.add_argument('--mode', choices=list(ProductGarbageCollector.MODES), default='dry-run',
+                           help='dry-run - только показать, archive - перенести в архив, '
+                                'delete - удалить')
+
+    migrate_parser = subparsers.add_parser('migrate-layout',
+                                           help='Перевод папки products в другую схему')
+    migrate_parser.add_argument('--depth', type=int, required=True,
+                                help='Число уровней папок-префиксов (0 - плоская схема)')
+
+    verify_parser = subparsers.add_parser('verify', help='Проверка файлов по манифесту запуска')
+    verify_parser.add_argument('--manifest', type=Path,
+                               help='Файл манифеста (по умолчанию - последний запуск)')
+    verify_parser.add_argument('--workers', type=int, help='Число процессов для подсчета хэшей')
+    verify_parser.add_argument('--no-repair', action='store_true',
+                               help='Только проверить, не скачивая испорченные файлы заново')
+    verify_parser.add_argument('--engine', choices=list(DOWNLOAD_ENGINES), help='Движок загрузки')
+
+    return parser
+
+def load_cli_layout():
+    layout = ProductLayout.load(Path("products"))
+    if layout.warning:
+        print(layout.warning)
+    return layout
+
+def run_verify(args):
+    layout = load_cli_layout()
+    manifest_path = args.manifest or RunManifest.latest(layout)
+    if manifest_path is None:
+        print("⚠️ Манифестов запусков пока нет")
+        return 1
+
+    def on_progress(done, total):
+        if done == total or done % 1000 == 0:
+            print(f"  {done}/{total}", flush=True)
+
+    verifier = ManifestVerifier(manifest_path, layout, CatalogIndex(fetch_catalog()),
+                                ProductJournal(layout), args.workers)
+    print(f"🩺 Манифест: {manifest_path}")
+    stats = verifier.verify(on_progress)
+    if stats['bad'] and not args.no_repair:
+        verifier.repair(stats, create_downloader(args.engine), on_progress)
+    print(ManifestVerifier.format_stats(stats))
+    unresolved = len(stats['bad']) - stats['repaired'] if not args.no_repair else len(stats['bad'])
+    return 1 if unresolved else 0
+
+def run_migrate_layout(args):
+    layout = load_cli_layout()
+    if args.depth == layout.depth:
+        print(f"✅ Папка products уже в схеме с глубиной {layout.depth}")
+        return 0
+
+    def on_progress(done, total):
+        if done == total or done % 1000 == 0:
+            print(f"  {done}/{total}", flush=True)
+
+    target, moved = layout.migrate(args.depth, on_progress)
+    print(f"✅ Перенесено папок: {moved}, глубина схемы: {layout.depth} → {target.depth}")
+    return 0
+
+def run_gc(args):
+    layout = load_cli_layout()
+    collector = ProductGarbageCollector(CatalogIndex(fetch_catalog()), ProductJournal(layout),
+                                        layout)
+    stats = collector.collect(args.mode)
+    print(ProductGarbageCollector.format_stats(stats))
+    return 1 if stats['errors'] else 0
+
+def run_mirror(args):
+    catalog_index = CatalogIndex(fetch_catalog())
+    product_cache = ProductCache()
+    product_cache.reset(catalog_index)
+
+    def on_progress(done, total):
+        if done == total or done % 500 == 0:
+            print(f"  {done}/{total}", flush=True)
+
+    layout = load_cli_layout()
+    mirror = CatalogMirror(catalog_index, product_cache, layout, create_downloader(args.engine),
+                           revalidate=args.revalidate, prune=not args.no_prune,
+                           journal=ProductJournal(layout))
+    stats = mirror.sync(on_progress)
+    print(CatalogMirror.format_stats(stats))
+    return 1 if stats['errors'] else 0
+
+def run_bench(args):
+    catalog_index = CatalogIndex(fetch_catalog())
+    urls = []
+    for article, offer in catalog_index.offers.items():
+        urls.extend(picture.text for picture in offer.iter('picture') if picture.text)
+        if len(urls) >= args.limit:
+            break
+    urls = urls[:args.limit]
+
+    rows = []
+    for engine in args.engine:
+        downloader = create_downloader(engine, concurrency=args.concurrency)
+        downloader.start()
+        start_time = time.perf_counter()
+        for url in urls:
+            downloader.submit(url, lambda data, error, meta: None)
+        downloader.close()
+        duration = time.perf_counter() - start_time
+
+        stats = downloader.stats()
+        requests_done = stats['fetch_count'] + stats['fetch_errors']
+        rows.append((
+            engine,
+            downloader.concurrency,
+            stats['fetch_count'],
+            stats['fetch_errors'],
+            f"{duration:.2f}",
+            f"{stats['fetch_count'] / duration:.1f}",
+            f"{stats['fetch_bytes'] / 1048576 / duration:.2f}",
+            f"{stats['fetch_latency'] / max(1, requests_done) * 1000:.0f}",
+        ))
+
+    print(format_table(['Движок', 'Параллельно', 'Успешно', 'Ошибок', 'Время, с',
+                        'Файлов/с', 'МБ/с', 'Задержка, мс'], rows))
+    return 0
+
+def run_stats(args):
+    start_time = time.perf_counter()
+    analytics = CatalogAnalytics.from_xml(fetch_catalog())
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    headers, rows = analytics.report(args.aggregate, by=args.by, value=args.value,
+                                     bins=args.bins, group=args.group)
+    report_time = (time.perf_counter() - start_time) * 1000
+
+    print(format_table(headers, rows))
+    print(f"\nТоваров: {len(analytics)}, загрузка каталога {load_time:.1f} с, "
+          f"расчёт {report_time:.1f} мс")
+    return 0
+
+def run_cli(args):
+    try:
+        if args.command == 'stats':
+            return run_stats(args)
+        if args.command == 'bench':
+            return run_bench(args)
+        if args.command == 'mirror':
+            return run_mirror(args)
+        if args.command == 'gc':
+            return run_gc(args)
+        if args.command == 'migrate-layout':
+            return run_migrate_layout(args)
+        if args.command == 'verify':
+            return run_verify(args)
+    except Exception as e:
+        print(f"❌ {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    window = ParserApp()
-    window.show()
+    # Нужно для пула процессов проверки в собранном exe
+    multiprocessing.freeze_support()
+    with STARTUP_TRACE.span('settings'):
+        args, qt_args = build_arg_parser().parse_known_args()
+    if args.command:
+        sys.exit(run_cli(args))
+
+    with STARTUP_TRACE.span('qapplication'):
+        app = QApplication(sys.argv[:1] + qt_args)
+    with STARTUP_TRACE.span('main_window'):
+        window = ParserApp(args.trace, args.trace_format, args.defer_noncritical or None)
+    with STARTUP_TRACE.span('show'):
+        window.show()
     sys.exit(app.exec()) 
\ No newline at end of file